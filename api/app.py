@@ -1,15 +1,23 @@
 import os
-from flask import Flask
+import threading
+import click
+from flask import Flask, Response, request
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_bcrypt import Bcrypt
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
 from extensions.login import login_manager
+from extensions.db_pool import pool_stats
+from extensions.tracing import init_tracing, render_prometheus
+from extensions.log import configure_logging, init_request_logging, logging_stats
 from dotenv import load_dotenv
 
 load_dotenv()
 
+configure_logging(Config.LOG_LEVEL, Config.LOG_FORMAT, Config.LOG_QUEUE_SIZE)
+
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 TMDB_BASE_URL = os.getenv("TMDB_BASE_URL")
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS")
@@ -21,6 +29,21 @@ bcrypt = Bcrypt()
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    if Config.PROXY_FIX_X_FOR > 0:
+        # request.remote_addr becomes the client address the proxies saw
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.PROXY_FIX_X_FOR, x_proto=Config.PROXY_FIX_X_FOR)
+
+    def metrics_authorized() -> bool:
+        if Config.METRICS_TOKEN:
+            return request.headers.get("Authorization") == f"Bearer {Config.METRICS_TOKEN}"
+        return Config.METRICS_PUBLIC or app.debug
+
+    def server_timing_enabled() -> bool:
+        return Config.SERVER_TIMING or app.debug or (bool(Config.METRICS_TOKEN) and metrics_authorized())
+
+    # First, so the other request hooks are timed too
+    init_tracing(app, server_timing_enabled)
+    init_request_logging(app, Config.LOG_ACCESS_SAMPLE_RATE)
 
     db.init_app(app)
     migrate.init_app(app, db)
@@ -43,24 +66,139 @@ def create_app():
     # import models so Alembic sees them
     from models.user import User
     from models.library_item import LibraryItem
+    from models.movie_resolution import MovieResolution
+    from models.recommendation_job import RecommendationJob
+    from models.movie_document import MovieDocument
+    from models.user_search_gram import UserSearchGram
+    from models.movie import Movie
+    from models.backfill_checkpoint import BackfillCheckpoint
+    from models.worker_lease import WorkerLease
+
+    from services.identity import load_identity
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return load_identity(int(user_id))
 
     # register blueprints
     from routes.auth import auth_bp
     from routes.movies import movies_bp
     from routes.library import library_bp
     from routes.recommendations import recommendations_bp
+    from extensions.rate_limit import limit_blueprint, rate_limited_response
+    from services.token_bucket import RateLimited
+
+    # Token costs track upstream work: a recommendation run is one OpenAI
+    # call plus ~10 TMDB lookups, polling a job is free
+    limit_blueprint(app, auth_bp, Config.RATE_LIMIT_AUTH, costs={"logout": 0, "get_current_user": 0})
+    limit_blueprint(app, movies_bp, Config.RATE_LIMIT_MOVIES)
+    limit_blueprint(app, library_bp, Config.RATE_LIMIT_LIBRARY, costs={"bulk_import": 20, "export_library": 5})
+    limit_blueprint(app, recommendations_bp, Config.RATE_LIMIT_RECS, costs={
+        "get_recommendations": 10,
+        "stream_recommendations_route": 10,
+        "get_recommendation_job": 0,
+    })
+    app.register_error_handler(RateLimited, rate_limited_response)
+
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(movies_bp, url_prefix="/api/movies")
     app.register_blueprint(library_bp, url_prefix="/api/library")
     app.register_blueprint(recommendations_bp, url_prefix="/api/recs")
 
+    from services.cache_warmer import warm_caches, start_cache_warmer
+
+    @app.cli.command("warm-cache")
+    @click.option("--popular-pages", type=int, default=None, help="Popular list pages to fetch.")
+    @click.option("--top-movies", type=int, default=None, help="Most-saved library movies to fetch details for.")
+    @click.option("--top-searches", type=int, default=None, help="Top recent search queries to fetch.")
+    @click.option("--rate", type=float, default=None, help="Max upstream requests per second.")
+    @click.option("--refresh", is_flag=True, help="Re-fetch entries that are already cached.")
+    def warm_cache_command(popular_pages, top_movies, top_searches, rate, refresh):
+        """Pre-fetch TMDB responses into the cache and document store."""
+        summary = warm_caches(popular_pages, top_movies, top_searches, rate, refresh, report=click.echo)
+        click.echo(f"Done: {summary}")
+
+    from services.metadata_backfill import backfill_movie_metadata, start_metadata_backfill
+
+    @app.cli.command("backfill-metadata")
+    @click.option("--batch-size", type=int, default=None, help="Movies per checkpointed batch.")
+    @click.option("--rate", type=float, default=None, help="Max upstream requests per second.")
+    @click.option("--max-batches", type=int, default=None, help="Stop after this many batches.")
+    def backfill_metadata_command(batch_size, rate, max_batches):
+        """Fetch genres/runtime for library movies missing from the movies table."""
+        summary = backfill_movie_metadata(batch_size, rate, max_batches, report=click.echo)
+        click.echo(f"Done: {summary}")
+
+    from services.jobs import purge_old_jobs
+
+    @app.cli.command("purge-jobs")
+    @click.option("--retention-hours", type=int, default=None, help="Delete jobs older than this.")
+    def purge_jobs_command(retention_hours):
+        """Delete old recommendation job rows."""
+        click.echo(f"Deleted {purge_old_jobs(retention_hours)} jobs")
+
+    background = []
+    if Config.CACHE_WARM_ON_START:
+        background.append(start_cache_warmer)
+    if Config.METADATA_BACKFILL_INTERVAL > 0:
+        background.append(start_metadata_backfill)
+
+    if background:
+        # Started on the first request so CLI commands (db upgrade etc.) don't
+        # run them. Every worker starts its threads; for shared work a lease
+        # in the database picks the one that actually does it.
+        started = []
+        start_lock = threading.Lock()
+
+        @app.before_request
+        def start_background_once():
+            if started:
+                return
+            with start_lock:
+                if not started:
+                    started.extend(start(app) for start in background)
+
     @app.get("/health")
     def health():
         return { "ok": True }
+
+    @app.get("/health/pool")
+    def pool_health():
+        """DB connection pool occupancy and checkout wait times. Guarded
+        like /metrics.
+        """
+        if not metrics_authorized():
+            return { "error": "Unauthorized" }, 401
+        return pool_stats(db.engine)
+
+    from services import tmdb, openai
+    from services.identity import identity_cache_stats
+    from services.recommendationService import recs_cache
+    from services.search_index import search_index
+    from services.token_bucket import buckets
+
+    @app.get("/metrics")
+    def metrics():
+        """Prometheus text format: span/request latency histograms plus
+        cache, single-flight, prompt, pool and search index counters.
+        Requires "Authorization: Bearer <METRICS_TOKEN>" (see Config).
+        """
+        if not metrics_authorized():
+            return { "error": "Unauthorized" }, 401
+
+        body = render_prometheus({
+            "tmdb_cache": tmdb.cache_stats(),
+            "tmdb_flight": tmdb.flight_stats(),
+            "openai_flight": openai.flight.stats(),
+            "openai_prompt": dict(openai.prompt_metrics),
+            "recs_cache": recs_cache.stats(),
+            "identity_cache": identity_cache_stats(),
+            "search_index": search_index.stats(),
+            "db_pool": pool_stats(db.engine),
+            "rate_limit": buckets.stats(),
+            "logging": logging_stats(),
+        })
+        return Response(body, mimetype="text/plain; version=0.0.4")
     
     return app
 
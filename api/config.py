@@ -1,13 +1,191 @@
 import os
 from pathlib import Path
+from dotenv import load_dotenv
+
+from extensions.db_pool import TimedQueuePool
+
+load_dotenv()
 
 basedir = Path(__file__).resolve().parent
 
+
+def _database_url() -> str:
+    url = os.getenv("DATABASE_URL", f"sqlite:///{basedir / 'moviematch.db'}")
+    # Heroku-style URLs; SQLAlchemy only accepts the postgresql:// scheme
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def _engine_options(url: str) -> dict:
+    """Production profile for Postgres, WAL-mode file pool for SQLite dev.
+
+    SQLite pragmas are applied per connection in extensions/db_pool.py.
+    """
+    if url.startswith("sqlite"):
+        if ":memory:" in url or url in ("sqlite://", "sqlite:///"):
+            return {}
+        return {
+            "poolclass": TimedQueuePool,
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "connect_args": {"timeout": 15, "check_same_thread": False},
+        }
+
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        # Below typical server/LB idle timeouts, so stale sockets are retired first
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+    if url.startswith("postgresql"):
+        statement_timeout = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+        options["connect_args"] = {
+            "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "5")),
+            "options": f"-c statement_timeout={statement_timeout}",
+            "application_name": "moviematch-api",
+        }
+    return options
+
+
 class Config:
-    SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", f"sqlite:///{basedir}/'moviematch.db'")
+    SQLALCHEMY_DATABASE_URI = _database_url()
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
     TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+    TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+
+    # Pooled keep-alive HTTP client for TMDB
+    TMDB_POOL_SIZE = int(os.getenv("TMDB_POOL_SIZE", "20"))
+    TMDB_CONNECT_TIMEOUT = float(os.getenv("TMDB_CONNECT_TIMEOUT", "3.05"))
+    TMDB_READ_TIMEOUT = float(os.getenv("TMDB_READ_TIMEOUT", "10"))
+    TMDB_MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "3"))
+    TMDB_BACKOFF_FACTOR = float(os.getenv("TMDB_BACKOFF_FACTOR", "0.3"))
+    TMDB_BACKOFF_MAX = float(os.getenv("TMDB_BACKOFF_MAX", "2"))
+    # Longest a caller waits for a free pooled connection
+    TMDB_POOL_TIMEOUT = float(os.getenv("TMDB_POOL_TIMEOUT", "5"))
+
+    # TMDB response cache: "memory" is per-process, "sqlite" is shared by workers
+    TMDB_CACHE_BACKEND = os.getenv("TMDB_CACHE_BACKEND", "memory")
+    TMDB_CACHE_PATH = os.getenv("TMDB_CACHE_PATH", str(basedir / "tmdb_cache.db"))
+    TMDB_CACHE_MAX_ENTRIES = int(os.getenv("TMDB_CACHE_MAX_ENTRIES", "2048"))
+    TMDB_CACHE_TTL_SEARCH = int(os.getenv("TMDB_CACHE_TTL_SEARCH", "900"))
+    TMDB_CACHE_TTL_POPULAR = int(os.getenv("TMDB_CACHE_TTL_POPULAR", "3600"))
+    TMDB_CACHE_TTL_DETAILS = int(os.getenv("TMDB_CACHE_TTL_DETAILS", "86400"))
+
+    # Stored movie detail documents are refreshed in the background after this
+    MOVIE_DOC_TTL = int(os.getenv("MOVIE_DOC_TTL", str(7 * 86400)))
+
+    # Parallel TMDB lookups for LLM recommendations
+    RECS_RESOLVE_WORKERS = int(os.getenv("RECS_RESOLVE_WORKERS", "8"))
+    RECS_RESOLVE_TIMEOUT = float(os.getenv("RECS_RESOLVE_TIMEOUT", "5"))
+
+    # OpenAI recommendations; the budget caps the estimated prompt tokens
+    OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+    OPENAI_PROMPT_TOKEN_BUDGET = int(os.getenv("OPENAI_PROMPT_TOKEN_BUDGET", "3000"))
+    # Most recent items per member sent to the LLM (shared movies always are)
+    RECS_MAX_ITEMS_PER_MEMBER = int(os.getenv("RECS_MAX_ITEMS_PER_MEMBER", "300"))
+
+    # Recommendation backend: "local" (collaborative filtering, falls back to
+    # the LLM on cold start) or "llm"
+    RECS_BACKEND = os.getenv("RECS_BACKEND", "local")
+    RECS_COUNT = int(os.getenv("RECS_COUNT", "10"))
+    RECS_LOCAL_STRATEGY = os.getenv("RECS_LOCAL_STRATEGY", "average")
+    RECS_LOCAL_MIN_RESULTS = int(os.getenv("RECS_LOCAL_MIN_RESULTS", "5"))
+    RECS_LOCAL_MAX_ITEMS_PER_USER = int(os.getenv("RECS_LOCAL_MAX_ITEMS_PER_USER", "200"))
+    RECS_LOCAL_REFRESH_SECONDS = int(os.getenv("RECS_LOCAL_REFRESH_SECONDS", "600"))
+
+    # Group recommendation results, keyed by a fingerprint of the members' libraries
+    RECS_CACHE_BACKEND = os.getenv("RECS_CACHE_BACKEND", "memory")
+    RECS_CACHE_PATH = os.getenv("RECS_CACHE_PATH", str(basedir / "recs_cache.db"))
+    RECS_CACHE_MAX_ENTRIES = int(os.getenv("RECS_CACHE_MAX_ENTRIES", "512"))
+    RECS_CACHE_TTL = int(os.getenv("RECS_CACHE_TTL", "86400"))
+
+    # Background recommendation jobs
+    RECS_JOB_WORKERS = int(os.getenv("RECS_JOB_WORKERS", "4"))
+    RECS_JOB_STALE_SECONDS = int(os.getenv("RECS_JOB_STALE_SECONDS", "300"))
+    # Job rows older than this are deleted (checked at most hourly on submit)
+    RECS_JOB_RETENTION_HOURS = int(os.getenv("RECS_JOB_RETENTION_HOURS", "24"))
+
+    # Password hashing runs in a process pool (per server process) one short
+    # of the cores, leaving one for request handling; hashes made with
+    # another cost are upgraded on login
+    BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", "12"))
+    BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(max(1, (os.cpu_count() or 1) - 1))))
+    BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", str(BCRYPT_WORKERS * 8)))
+    BCRYPT_TIMEOUT = float(os.getenv("BCRYPT_TIMEOUT", "10"))
+    AUTH_MAX_CONCURRENT_PER_IP = int(os.getenv("AUTH_MAX_CONCURRENT_PER_IP", "2"))
+
+    # Reverse proxies in front of the app whose X-Forwarded-For/-Proto are
+    # trusted, so per-IP limits see the real client. Leave at 0 when clients
+    # connect directly: they could otherwise forge the header.
+    PROXY_FIX_X_FOR = int(os.getenv("PROXY_FIX_X_FOR", "0"))
+
+    # Cached session identities (flask-login user loader)
+    IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", "60"))
+    IDENTITY_CACHE_MAX_ENTRIES = int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", "10000"))
+
+    # Local movie search index; TMDB is searched when it has fewer matches
+    SEARCH_INDEX_REFRESH_SECONDS = int(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "600"))
+    SEARCH_LOCAL_MIN_RESULTS = int(os.getenv("SEARCH_LOCAL_MIN_RESULTS", "5"))
+    SEARCH_PAGE_SIZE = 20
+
+    # Cache warmer (flask warm-cache, or a background thread on start).
+    # Warming from the CLI only reaches other processes with the sqlite cache.
+    CACHE_WARM_ON_START = os.getenv("CACHE_WARM_ON_START", "false").lower() == "true"
+    CACHE_WARM_INTERVAL = int(os.getenv("CACHE_WARM_INTERVAL", "0"))
+    CACHE_WARM_POPULAR_PAGES = int(os.getenv("CACHE_WARM_POPULAR_PAGES", "5"))
+    CACHE_WARM_TOP_MOVIES = int(os.getenv("CACHE_WARM_TOP_MOVIES", "200"))
+    CACHE_WARM_TOP_SEARCHES = int(os.getenv("CACHE_WARM_TOP_SEARCHES", "50"))
+    CACHE_WARM_RATE = float(os.getenv("CACHE_WARM_RATE", "20"))
+    SEARCH_STATS_FLUSH_SECONDS = int(os.getenv("SEARCH_STATS_FLUSH_SECONDS", "60"))
+
+    # Genre/runtime backfill into the movies table (flask backfill-metadata);
+    # a positive interval also runs it on a background thread
+    METADATA_BACKFILL_BATCH_SIZE = int(os.getenv("METADATA_BACKFILL_BATCH_SIZE", "50"))
+    METADATA_BACKFILL_RATE = float(os.getenv("METADATA_BACKFILL_RATE", "10"))
+    METADATA_BACKFILL_INTERVAL = int(os.getenv("METADATA_BACKFILL_INTERVAL", "0"))
+    # Shared background work (the backfill, warming the sqlite cache) runs
+    # in one process, the holder of a lease in the database; it passes to
+    # another worker if a run takes longer than this or the holder dies
+    BACKGROUND_LEASE_SECONDS = int(os.getenv("BACKGROUND_LEASE_SECONDS", "900"))
+
+    # Token-bucket rate limits: "memory" buckets are per-process, "sqlite"
+    # buckets are shared by workers. Rates are "<count>/<period>"; "0" disables
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", str(basedir / "rate_limits.db"))
+    # Per signed-in user (or per IP when anonymous), per blueprint
+    RATE_LIMIT_AUTH = os.getenv("RATE_LIMIT_AUTH", "30/minute")
+    RATE_LIMIT_MOVIES = os.getenv("RATE_LIMIT_MOVIES", "120/minute")
+    RATE_LIMIT_LIBRARY = os.getenv("RATE_LIMIT_LIBRARY", "120/minute")
+    RATE_LIMIT_RECS = os.getenv("RATE_LIMIT_RECS", "100/hour")
+    # Global budgets per upstream API; requests wait up to UPSTREAM_MAX_WAIT
+    # seconds for a token before failing with 429
+    UPSTREAM_RATE_TMDB = os.getenv("UPSTREAM_RATE_TMDB", "40/second")
+    UPSTREAM_RATE_OPENAI = os.getenv("UPSTREAM_RATE_OPENAI", "60/minute")
+    UPSTREAM_MAX_WAIT = float(os.getenv("UPSTREAM_MAX_WAIT", "2"))
+
+    # JSON-lines logging through a background writer thread; records are
+    # dropped (and counted in /metrics) once LOG_QUEUE_SIZE are waiting
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Fraction of non-5xx requests written to the access log
+    LOG_ACCESS_SAMPLE_RATE = float(os.getenv("LOG_ACCESS_SAMPLE_RATE", "0.1"))
+
+    # GET /metrics and /health/pool require "Authorization: Bearer <token>".
+    # Without a token they answer 401, unless METRICS_PUBLIC opts in (for
+    # servers only reachable internally) or the app runs in debug mode.
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() == "true"
+    # Server-Timing headers go to every client when on; otherwise only to
+    # requests carrying the metrics token, or in debug mode
+    SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
 
     SESSION_COOKIE_SAMESITE = "None"
     SESSION_COOKIE_SECURE = True
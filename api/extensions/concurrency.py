@@ -0,0 +1,52 @@
+import threading
+from functools import wraps
+
+from flask import jsonify, request
+
+
+class ConcurrencyLimiter:
+    """Caps how many requests each key (e.g. client IP) has in flight."""
+
+    def __init__(self, max_per_key: int):
+        self.max_per_key = max_per_key
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key) -> bool:
+        with self._lock:
+            count = self._active.get(key, 0)
+            if count >= self.max_per_key:
+                return False
+            self._active[key] = count + 1
+            return True
+
+    def release(self, key) -> None:
+        with self._lock:
+            count = self._active.get(key, 0) - 1
+            if count > 0:
+                self._active[key] = count
+            else:
+                self._active.pop(key, None)
+
+
+def limit_concurrency_per_ip(max_per_ip: int):
+    """Route decorator answering 429 while the client IP already has
+    `max_per_ip` requests in flight on the route. Behind a proxy this needs
+    PROXY_FIX_X_FOR set, or every client shares the proxy's address.
+    """
+    limiter = ConcurrencyLimiter(max_per_ip)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            key = request.remote_addr
+            if not limiter.acquire(key):
+                resp = jsonify({ "error": "Too many concurrent requests" })
+                resp.headers["Retry-After"] = "1"
+                return resp, 429
+            try:
+                return view(*args, **kwargs)
+            finally:
+                limiter.release(key)
+        return wrapped
+    return decorator
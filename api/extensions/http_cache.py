@@ -0,0 +1,45 @@
+import hashlib
+from flask import current_app, request
+
+from extensions.tracing import span
+
+
+def conditional_json(payload, max_age: int = 0, public: bool = False, etag: str | None = None):
+    """JSON response with a strong ETag and Cache-Control, answering
+    If-None-Match with 304 Not Modified.
+
+    Without an explicit `etag` the tag is a hash of the serialized body.
+    """
+    with span("json.serialize"):
+        body = current_app.json.dumps(payload).encode()
+    return conditional_body(body, etag or hashlib.sha256(body).hexdigest(), max_age, public)
+
+
+def conditional_body(body: bytes, etag: str, max_age: int = 0, public: bool = False):
+    """Like conditional_json, for an already-serialized JSON body."""
+    resp = current_app.response_class(body, mimetype="application/json")
+    resp.set_etag(etag)
+    _cache_headers(resp, max_age, public)
+    return resp.make_conditional(request)
+
+
+def not_modified(etag: str, max_age: int = 0, public: bool = False):
+    """Return a 304 if the client already holds `etag`, else None.
+
+    Lets routes whose ETag is known up front skip building the body.
+    """
+    if etag not in request.if_none_match:
+        return None
+    resp = current_app.response_class(status=304)
+    resp.set_etag(etag)
+    _cache_headers(resp, max_age, public)
+    return resp
+
+
+def _cache_headers(resp, max_age: int, public: bool):
+    if public:
+        resp.cache_control.public = True
+        resp.cache_control.max_age = max_age
+    else:
+        resp.cache_control.private = True
+        resp.cache_control.no_cache = True
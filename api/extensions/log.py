@@ -0,0 +1,219 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, request
+
+# Correlation id of the request (or job) being handled; stamped on every
+# record logged from that context
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+SENSITIVE_KEYS = re.compile(r"(^|_)(pass(word)?|passwd|secret|token|authorization|cookie|api_?key|credentials?)($|_)", re.I)
+SENSITIVE_TEXT = [
+    (re.compile(r"(?i)\b(password|passwd|pwd|secret|token|api_?key)(['\"]?\s*[:=]\s*)(\"[^\"]*\"|'[^']*'|[^\s,&'\"}]+)"), r"\1\2[REDACTED]"),
+    (re.compile(r"(?i)\bBearer\s+[A-Za-z0-9._~+/=-]+"), "Bearer [REDACTED]"),
+    (re.compile(r"\bsk-[A-Za-z0-9_-]{8,}"), "[REDACTED]"),
+]
+REDACTED = "[REDACTED]"
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "sample_rate"}
+
+
+def redact(value):
+    """Mask credentials in log data: values under sensitive-looking keys,
+    and password/token/API key patterns inside strings.
+    """
+    if isinstance(value, dict):
+        return {k: REDACTED if SENSITIVE_KEYS.search(str(k)) else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        for pattern, replacement in SENSITIVE_TEXT:
+            value = pattern.sub(replacement, value)
+    return value
+
+
+class ContextFilter(logging.Filter):
+    """Stamps the request id and drops records that lose their sampling roll.
+
+    Log high-volume events with extra={"sample_rate": 0.01} to keep ~1% of
+    them; kept records carry the rate so counts can be scaled back up.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if rate is not None and rate < 1 and random.random() >= rate:
+            return False
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, request_id, any
+    `extra` fields and the exception, all redacted.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if getattr(record, "sample_rate", None) is not None:
+            entry["sample_rate"] = record.sample_rate
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(redact(entry), default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development, redacted like the JSON ones."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s]: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        return redact(super().format(record))
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the writer thread; drops them (and counts the drop)
+    when the queue is full rather than blocking the caller.
+
+    Only the message is rendered on the calling thread. Formatting and I/O
+    happen on the writer thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render args and the traceback now: they may not be safe to touch
+        # from another thread later
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler = None
+_listener = None
+
+
+def configure_logging(level: str = "INFO", fmt: str = "json", queue_size: int = 10000) -> None:
+    """Route all logging through a bounded queue to a background writer
+    thread that writes JSON (or text) lines to stderr. Safe to call twice.
+    """
+    global _handler, _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    _handler.addFilter(ContextFilter())
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    # Flush what's queued on shutdown
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    root.setLevel(level.upper())
+
+
+def logging_stats() -> dict:
+    if _handler is None:
+        return {}
+    return {"queued": _handler.queue.qsize(), "dropped": _handler.dropped}
+
+
+# === REQUESTS ===
+
+access_logger = logging.getLogger("moviematch.access")
+
+
+def init_request_logging(app, access_sample_rate: float = 1.0) -> None:
+    """Give each request a correlation id (the client's X-Request-ID when it
+    sends a sane one), echo it back, and write a sampled access log line.
+    Server errors are always logged.
+    """
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        request_id_var.set(incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex)
+        g.log_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(resp):
+        request_id = request_id_var.get()
+        if request_id:
+            resp.headers[REQUEST_ID_HEADER] = request_id
+
+        started = g.pop("log_started", None)
+        if started is not None:
+            extra = {
+                "method": request.method,
+                "path": request.path,
+                "endpoint": request.endpoint,
+                "status": resp.status_code,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            }
+            if resp.status_code < 500:
+                extra["sample_rate"] = access_sample_rate
+            access_logger.info("%s %s %s", request.method, request.path, resp.status_code, extra=extra)
+        return resp
+
+    @app.teardown_request
+    def clear_request_id(exc):
+        request_id_var.set(None)
+
+
+def bind_request_id(fn):
+    """Wrap `fn` so it runs under the caller's request id, e.g. on a pool thread."""
+    request_id = request_id_var.get()
+
+    def bound(*args, **kwargs):
+        token = request_id_var.set(request_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            request_id_var.reset(token)
+    return bound
@@ -0,0 +1,48 @@
+from flask import Blueprint, Flask, jsonify, request
+from flask_login import current_user
+
+from services.token_bucket import RateLimited, buckets, parse_rate
+
+
+def rate_limited_response(e: RateLimited):
+    resp = jsonify({ "error": str(e), "retry_after": float(e.retry_after_header) })
+    resp.headers["Retry-After"] = e.retry_after_header
+    return resp, 429
+
+
+def client_key() -> str:
+    """Signed-in users get their own bucket; anonymous clients share one per
+    IP (the real client's behind proxies when PROXY_FIX_X_FOR is set).
+    """
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    return f"ip:{request.remote_addr}"
+
+
+def limit_blueprint(app: Flask, bp: Blueprint, rate: str | None, costs: dict | None = None, default_cost: float = 1) -> None:
+    """Give each client a token bucket for the routes `app` serves from `bp`.
+
+    `rate` is "<count>/<period>" (see parse_rate); `costs` maps endpoint
+    function names to how many tokens a request spends, so routes that
+    fan out to TMDB/OpenAI drain the budget faster. A cost of 0 exempts
+    the route. The hook is registered on the app, not the (module-level)
+    blueprint, so every app built by create_app gets exactly one.
+    """
+    parsed = parse_rate(rate)
+    if parsed is None:
+        return
+    capacity, refill = parsed
+    costs = costs or {}
+
+    @app.before_request
+    def take_rate_limit_tokens():
+        if request.blueprint != bp.name or request.method == "OPTIONS":
+            return None
+        cost = costs.get(request.endpoint.rpartition(".")[2], default_cost)
+        if cost <= 0:
+            return None
+
+        allowed, retry_after = buckets.take(f"{bp.name}:{client_key()}", capacity, refill, min(cost, capacity))
+        if not allowed:
+            return rate_limited_response(RateLimited(retry_after, bp.name))
+        return None
@@ -0,0 +1,209 @@
+import contextvars
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def snapshot(self) -> tuple[list[int], int, float]:
+        """(cumulative bucket counts, count, sum)"""
+        with self._lock:
+            counts, count, total = list(self._counts), self.count, self.sum
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, count, total
+
+
+class HistogramFamily:
+    """Histograms keyed by one label value, created on first use."""
+
+    def __init__(self, name: str, label: str, help: str):
+        self.name = name
+        self.label = label
+        self.help = help
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: str, seconds: float) -> None:
+        histogram = self._histograms.get(value)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(value, Histogram())
+        histogram.observe(seconds)
+
+    def items(self) -> list[tuple[str, Histogram]]:
+        with self._lock:
+            return sorted(self._histograms.items())
+
+
+span_seconds = HistogramFamily("moviematch_span_seconds", "span", "Time spent in instrumented service calls and DB queries.")
+request_seconds = HistogramFamily("moviematch_request_seconds", "endpoint", "Request handling time until the response is returned (streamed bodies excluded).")
+
+
+# === SPANS ===
+
+class Trace:
+    """Span totals for one request: name -> [calls, seconds]."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.spans.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def server_timing(self, total: float) -> str:
+        with self._lock:
+            spans = sorted(self.spans.items())
+        parts = [f'{name};dur={seconds * 1000:.1f};desc="{calls}x"' for name, (calls, seconds) in spans]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+# The current request's trace. Pool threads start without one, so their
+# spans only reach the histograms.
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+def record(name: str, seconds: float) -> None:
+    span_seconds.observe(name, seconds)
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def traced(name: str):
+    """Decorator recording each call of the function as a span."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapped(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+    record(f"db.{verb}", time.perf_counter() - started)
+
+
+@event.listens_for(Engine, "handle_error")
+def _query_failed(context):
+    # after_cursor_execute doesn't fire for failed statements
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def init_tracing(app, server_timing=lambda: True) -> None:
+    """Trace every request into the latency histograms, and report its
+    spans in a Server-Timing header when `server_timing()` is true for it.
+
+    Register before other request hooks so their work is included.
+    """
+    @app.before_request
+    def start_trace():
+        _trace.set(Trace())
+
+    @app.after_request
+    def add_server_timing(resp):
+        trace = _trace.get()
+        if trace is None:
+            return resp
+        total = time.perf_counter() - trace.started
+        request_seconds.observe(request.endpoint or "unmatched", total)
+        # Span timings reveal internals (query counts, cache hits)
+        if server_timing():
+            resp.headers["Server-Timing"] = trace.server_timing(total)
+        return resp
+
+    @app.teardown_request
+    def end_trace(exc):
+        _trace.set(None)
+
+
+# === PROMETHEUS ===
+
+def _metric_name(*parts: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(parts))
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_histograms(family: HistogramFamily) -> list[str]:
+    lines = [f"# HELP {family.name} {family.help}", f"# TYPE {family.name} histogram"]
+    for value, histogram in family.items():
+        label = f'{family.label}="{_label(value)}"'
+        cumulative, count, total = histogram.snapshot()
+        for bound, c in zip(histogram.buckets + ("+Inf",), cumulative):
+            lines.append(f'{family.name}_bucket{{{label},le="{bound}"}} {c}')
+        lines.append(f"{family.name}_sum{{{label}}} {total}")
+        lines.append(f"{family.name}_count{{{label}}} {count}")
+    return lines
+
+
+def render_prometheus(gauges: dict[str, dict]) -> str:
+    """Prometheus text exposition of the span/request histograms plus
+    `gauges`, a {group: stats dict} map whose numeric values become
+    moviematch_<group>_<key> gauges (other values are skipped).
+    """
+    lines = _render_histograms(span_seconds) + _render_histograms(request_seconds)
+    for group, stats in gauges.items():
+        for key, value in stats.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if not isinstance(value, (int, float)):
+                continue
+            name = _metric_name("moviematch", group, key)
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,79 @@
+"""Add user search indexes and user_search_grams table
+
+Revision ID: 7a3d9c4e1b86
+Revises: 1f6c8d2b7e90
+Create Date: 2026-10-18 22:04:41.603172
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3d9c4e1b86'
+down_revision = '1f6c8d2b7e90'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _grams(display_name, email):
+    # Same as services.user_search.user_grams, copied so the migration
+    # doesn't depend on application code
+    def trigrams(text):
+        text = (text or "").lower()
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+    return trigrams(display_name) | trigrams(email)
+
+
+def upgrade():
+    op.create_table('user_search_grams',
+    sa.Column('gram', sa.String(length=3), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('gram', 'user_id')
+    )
+    with op.batch_alter_table('user_search_grams', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_search_grams_user_id'), ['user_id'], unique=False)
+
+    op.create_index('ix_users_display_name_lower', 'users', [sa.text('lower(display_name)')], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index(
+            'ix_users_display_name_trgm', 'users', [sa.text('lower(display_name) gin_trgm_ops')],
+            unique=False, postgresql_using='gin',
+        )
+        op.create_index(
+            'ix_users_email_trgm', 'users', [sa.text('lower(email) gin_trgm_ops')],
+            unique=False, postgresql_using='gin',
+        )
+        return
+
+    # Backfill grams for existing users
+    grams_table = sa.table('user_search_grams', sa.column('gram'), sa.column('user_id'))
+    users = bind.execute(sa.text('SELECT id, display_name, email FROM users'))
+    rows = []
+    for user_id, display_name, email in users:
+        rows.extend({'gram': g, 'user_id': user_id} for g in _grams(display_name, email))
+        if len(rows) >= BATCH_SIZE:
+            op.bulk_insert(grams_table, rows)
+            rows = []
+    if rows:
+        op.bulk_insert(grams_table, rows)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_users_email_trgm', table_name='users')
+        op.drop_index('ix_users_display_name_trgm', table_name='users')
+
+    op.drop_index('ix_users_display_name_lower', table_name='users')
+
+    with op.batch_alter_table('user_search_grams', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_search_grams_user_id'))
+
+    op.drop_table('user_search_grams')
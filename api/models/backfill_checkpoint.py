@@ -0,0 +1,16 @@
+from datetime import datetime
+from app import db
+
+from sqlalchemy import Column, Integer, String, DateTime
+
+
+class BackfillCheckpoint(db.Model):
+    """Progress of a resumable backfill: the last key it finished."""
+    __tablename__ = "backfill_checkpoints"
+
+    name = Column(String(64), primary_key=True)
+    last_key = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
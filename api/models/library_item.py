@@ -15,10 +15,11 @@ class LibraryItem(db.Model):
     release_date = db.Column(db.String(10))           # "YYYY-MM-DD"
     vote_average = db.Column(db.Float)
 
-    created_at = db.Column(db.DateTime, default=datetime.now(), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
 
     __table_args__ = (
         db.UniqueConstraint("user_id", "movie_id", name="uq_library_user_movie"),
+        db.Index("ix_library_items_user_created", "user_id", "created_at", "id"),
     )
 
 
@@ -0,0 +1,20 @@
+from datetime import datetime
+from app import db
+
+from sqlalchemy import Column, Integer, String, Float, DateTime
+
+
+class Movie(db.Model):
+    """Shared TMDB metadata, one row per movie across all libraries."""
+    __tablename__ = "movies"
+
+    movie_id = Column(Integer, primary_key=True, autoincrement=False)  # TMDB id
+    title = Column(String(255), nullable=False)
+    release_date = Column(String(10))        # "YYYY-MM-DD"
+    genres = Column(db.JSON, nullable=False)  # genre names
+    runtime = Column(Integer)                # minutes
+    popularity = Column(Float)
+    vote_average = Column(Float)
+    original_language = Column(String(8))
+
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
@@ -0,0 +1,14 @@
+from datetime import datetime
+from app import db
+
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary
+
+
+class MovieDocument(db.Model):
+    """Pre-mapped, zlib-compressed movie detail response, keyed by TMDB id."""
+    __tablename__ = "movie_documents"
+
+    movie_id = Column(Integer, primary_key=True, autoincrement=False)  # TMDB id
+    document = Column(LargeBinary, nullable=False)  # zlib(JSON) of the full mapped shape
+    etag = Column(String(64), nullable=False)       # sha256 of the uncompressed JSON
+    fetched_at = Column(DateTime, default=datetime.now, nullable=False)
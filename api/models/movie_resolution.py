@@ -0,0 +1,22 @@
+from datetime import datetime
+from app import db
+
+from sqlalchemy import Column, Integer, String, Float, DateTime
+
+
+class MovieResolution(db.Model):
+    """Local index from a normalized title + release year to a TMDB movie."""
+    __tablename__ = "movie_resolutions"
+
+    id = Column(Integer, primary_key=True)
+    movie_id = Column(Integer, nullable=False, unique=True)  # TMDB id
+    normalized_title = Column(String(255), nullable=False)
+    year = Column(Integer)
+    popularity = Column(Float)
+    payload = Column(db.JSON, nullable=False)                 # raw TMDB search result
+
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_movie_resolutions_title_year", "normalized_title", "year"),
+    )
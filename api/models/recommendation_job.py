@@ -0,0 +1,35 @@
+import uuid
+from datetime import datetime
+from app import db
+
+from sqlalchemy import Column, Integer, ForeignKey, String, DateTime, Text
+
+
+class RecommendationJob(db.Model):
+    __tablename__ = "recommendation_jobs"
+
+    id = Column(String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    requested_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    user_ids = Column(db.JSON, nullable=False)
+    backend = Column(String(16), nullable=False)
+    dedupe_key = Column(String(128), nullable=False, index=True)  # backend + group fingerprint
+
+    status = Column(String(16), nullable=False, default="queued")  # queued | running | done | failed
+    results = Column(db.JSON)
+    error = Column(Text)
+
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    finished_at = Column(DateTime)
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at.isoformat() + "Z",
+        }
+        if self.status == "done":
+            data["results"] = self.results or []
+        if self.status == "failed":
+            data["error"] = self.error
+        return data
@@ -1,9 +1,10 @@
 from datetime import datetime
-from app import db, bcrypt
+from app import db
 
-from sqlalchemy import Column, Integer, ForeignKey, String, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, String, DateTime, func
 from flask_login import UserMixin
-from flask_bcrypt import Bcrypt
+
+from services import passwords
 
 
 # UserMixin gives flask built in properties, e.g, is_authenticated or get_id()
@@ -16,10 +17,30 @@ class User(db.Model, UserMixin):
     password_hash = Column(String(255), nullable=False)
     display_name = Column(String(255), nullable=False)
     created_at = Column(DateTime, default=datetime.now())
+    # bumped on every library change; used as the library ETag
+    library_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # Prefix range scans for user search (emails are stored lowercased
+        # and already covered by the unique index)
+        db.Index("ix_users_display_name_lower", func.lower(display_name)),
+        # Substring search on Postgres; SQLite uses the user_search_grams table
+        db.Index(
+            "ix_users_display_name_trgm", func.lower(display_name).label("display_name_lower"),
+            postgresql_using="gin", postgresql_ops={"display_name_lower": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        db.Index(
+            "ix_users_email_trgm", func.lower(email).label("email_lower"),
+            postgresql_using="gin", postgresql_ops={"email_lower": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
-    # helper methods for password hashing
+    # helper methods for password hashing (run in the bcrypt process pool)
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode("utf-8")
+        self.password_hash = passwords.hash_password(password)
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
\ No newline at end of file
+        return passwords.check_password(password, self.password_hash)
+
+    def password_needs_rehash(self):
+        return passwords.needs_rehash(self.password_hash)
\ No newline at end of file
@@ -0,0 +1,15 @@
+from app import db
+
+from sqlalchemy import Column, Integer, ForeignKey, String
+
+
+class UserSearchGram(db.Model):
+    """Trigrams of each user's lowercased display name and email.
+
+    Substring user search on SQLite; Postgres uses pg_trgm indexes instead
+    and leaves this table empty.
+    """
+    __tablename__ = "user_search_grams"
+
+    gram = Column(String(3), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)
@@ -0,0 +1,12 @@
+from app import db
+
+from sqlalchemy import Column, String, DateTime
+
+
+class WorkerLease(db.Model):
+    """Which process currently runs a background task, and until when."""
+    __tablename__ = "worker_leases"
+
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(128), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
@@ -1,23 +1,33 @@
+import logging
 from flask import Blueprint, request, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
-from sqlalchemy import or_
-from app import db, bcrypt
+from app import db
+from config import Config
+from extensions.concurrency import limit_concurrency_per_ip
 from models.user import User
+from services.passwords import HashingBusy
+from services.user_search import search_users as find_users
 
 auth_bp = Blueprint("auth", __name__)
 
+logger = logging.getLogger(__name__)
+
+
+def _hashing_busy():
+    resp = jsonify({ "error": "Server busy, try again shortly" })
+    resp.headers["Retry-After"] = "1"
+    return resp, 503
+
 
 # === REGISTER ===
 @auth_bp.post("/register")
+@limit_concurrency_per_ip(Config.AUTH_MAX_CONCURRENT_PER_IP)
 def register():
-    print("Hit register")
     data = request.get_json()
     email = data.get("email", "").strip().lower()
     password = data.get("password", "")
     display_name = data.get("display_name", "")
 
-    print("Payload: ", data)
-
     if not email or not password or not display_name:
         return jsonify({ "error": "Email, password, and display name are required" }), 400
     
@@ -25,55 +35,65 @@ def register():
         return jsonify({ "error": "Email already registered" }), 400
     
     try:
-        print("Creating user")
         user = User(email=email, display_name=display_name)
         user.set_password(password)
 
-        print("Adding user to db")
         db.session.add(user)
         db.session.commit()
 
-        print("Logging in user")
         login_user(user)
+        logger.info("User registered", extra={"user_id": user.id})
 
         return jsonify({
             "id": user.id,
             "email": user.email,
             "display_name": user.display_name
         }), 201
-    except Exception as e:
-        print("REGISTER ERROR:", str(e))
-        return jsonify({"error": str(e)}), 500
+    except HashingBusy:
+        return _hashing_busy()
+    except Exception:
+        db.session.rollback()
+        logger.exception("Registration failed")
+        return jsonify({"error": "Registration failed"}), 500
 
 
 # === LOGIN ===
 @auth_bp.post("/login")
+@limit_concurrency_per_ip(Config.AUTH_MAX_CONCURRENT_PER_IP)
 def login():
     data = request.get_json()
     email = data.get("email", "").strip().lower()
     password = data.get("password", "")
 
-    print("LOGIN attempt:", email)
-
     user = User.query.filter_by(email=email).first()
-    print("LOGIN user found: ", bool(user))
 
     if user:
         try:
             ok = user.check_password(password)
-        except Exception as e:
-            print("LOGIN check_password ERROR:", repr(e))
+        except HashingBusy:
+            return _hashing_busy()
+        except Exception:
+            logger.exception("Password check failed for user %s", user.id)
             ok = False
-        print("LOGIN password ok:", ok)
     else:
         ok = False
 
     if not user or not ok:
-        print("LOGIN result: INVALID")
+        logger.debug("Login rejected", extra={"user_found": user is not None})
         return jsonify({"error": "Invalid credentials"}), 401
     
+    if user.password_needs_rehash():
+        # Cost factor changed since this hash was made; upgrade it while we
+        # have the plaintext. Best effort: the login succeeds regardless.
+        try:
+            user.set_password(password)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning("Password rehash failed for user %s: %r", user.id, e)
+
     login_user(user)
-    print("LOGIN result: SUCCESS for", email)
+    logger.debug("Login succeeded", extra={"user_id": user.id})
 
     return jsonify({
         "message": "Logged in successfully",
@@ -107,7 +127,7 @@ def get_current_user():
 @login_required
 def search_users():
     """Search users by display name or email.
-    Returns up to 10 users excluding the current user.
+    Returns up to 10 users excluding the current user, best match first.
     Query param: q
     """
     query = (request.args.get("q") or "").strip()
@@ -116,20 +136,7 @@ def search_users():
         return jsonify({"results": []}), 200
 
     try:
-        pattern = f"%{query}%"
-        users = (
-            User.query
-            .filter(
-                User.id != current_user.id,
-                or_(
-                    User.display_name.ilike(pattern),
-                    User.email.ilike(pattern),
-                ),
-            )
-            .order_by(User.display_name.asc())
-            .limit(10)
-            .all()
-        )
+        users = find_users(query, exclude_id=current_user.id, limit=10)
 
         results = [
             {"id": u.id, "display_name": u.display_name, "email": u.email}
@@ -1,19 +1,117 @@
-from flask import Blueprint, request, jsonify
+import base64
+import csv
+import hashlib
+import io
+import json
+import logging
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_login import login_required, current_user
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from app import db
 from models.library_item import LibraryItem
+from models.user import User
+from extensions.http_cache import conditional_json, not_modified
+from services.movie_documents import prefetch_movie
+from services.recommendationService import invalidate_user_recommendations
+from services.local_recommender import engine as local_engine
+from services.library_bulk import EXPORT_FIELDS, read_rows, import_rows, export_rows
 
 library_bp = Blueprint("library", __name__)
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+LIBRARY_FIELDS = ("id", "user_id", "movie_id", "title", "poster_path", "release_date", "vote_average", "created_at")
+
+
+def _encode_cursor(created_at: datetime, item_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    created_at, item_id = json.loads(raw)
+    return datetime.fromisoformat(created_at), int(item_id)
+
+
+def _bump_library_version(user_id: int) -> None:
+    db.session.execute(
+        db.update(User)
+        .where(User.id == user_id)
+        .values(library_version=User.library_version + 1)
+    )
+
+
+def _library_etag(user_id: int) -> str:
+    version = db.session.execute(
+        db.select(User.library_version).where(User.id == user_id)
+    ).scalar_one()
+    # Different pages / field sets of the same version need distinct tags
+    variant = hashlib.sha1(request.query_string).hexdigest()[:12]
+    return f"lib-{user_id}-{version}-{variant}"
+
+
+def _serialize(row, fields) -> dict:
+    item = {f: getattr(row, f) for f in fields}
+    if "created_at" in item:
+        item["created_at"] = row.created_at.isoformat() + "Z"
+    return item
+
+
 @library_bp.get("")
 @login_required
 def list_library():
-    items = (LibraryItem.query
-             .filter_by(user_id=current_user.id)
-             .order_by(LibraryItem.created_at.desc())
-             .all())
-    return jsonify([i.to_dict() for i in items]), 200
+    """Page through the current user's library, newest first.
+    Query params:
+      limit  - page size (default 50, max 500)
+      cursor - opaque `next_cursor` from the previous page
+      fields - comma-separated subset of item fields to return
+    Returns { "items": [...], "next_cursor": str | null }
+    """
+    # The library version is known before any rows are read, so an
+    # unchanged library costs one primary-key lookup
+    etag = _library_etag(current_user.id)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    limit = min(max(request.args.get("limit", default=DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+
+    fields = LIBRARY_FIELDS
+    if request.args.get("fields"):
+        fields = tuple(f.strip() for f in request.args["fields"].split(",") if f.strip())
+        unknown = [f for f in fields if f not in LIBRARY_FIELDS]
+        if unknown or not fields:
+            return jsonify({ "error": f"Unknown fields: {', '.join(unknown)}" }), 400
+
+    # Keyset pagination on (created_at, id), served by ix_library_items_user_created
+    columns = {f: getattr(LibraryItem, f) for f in fields + ("created_at", "id")}
+    query = (db.select(*columns.values())
+             .where(LibraryItem.user_id == current_user.id)
+             .order_by(LibraryItem.created_at.desc(), LibraryItem.id.desc())
+             .limit(limit + 1))
+
+    if request.args.get("cursor"):
+        try:
+            created_at, item_id = _decode_cursor(request.args["cursor"])
+        except (ValueError, TypeError):
+            return jsonify({ "error": "Invalid cursor" }), 400
+        query = query.where(tuple_(LibraryItem.created_at, LibraryItem.id) < (created_at, item_id))
+
+    rows = db.session.execute(query).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return conditional_json({
+        "items": [_serialize(r, fields) for r in rows],
+        "next_cursor": next_cursor,
+    }, etag=etag)
 
 @library_bp.post("/add")
 @login_required
@@ -36,11 +134,25 @@ def add_to_library():
 
     try:
         db.session.add(item)
+        db.session.flush()
+        _bump_library_version(current_user.id)
         db.session.commit()
     except IntegrityError:
         db.session.rollback()
         return jsonify({"message": "Already in library"}), 200
-    
+
+    invalidate_user_recommendations(current_user.id)
+    # The model is shared by every user, so feed it the stored row (as a
+    # rebuild would), not the client's payload
+    local_engine.record_add(current_user.id, {
+        "id": item.movie_id,
+        "title": item.title,
+        "poster_path": item.poster_path,
+        "release_date": item.release_date,
+        "vote_average": item.vote_average,
+    })
+    # The shared index only takes TMDB payloads, never the client's copy
+    prefetch_movie(item.movie_id)
     return jsonify({"message": "Added", "item": item.to_dict()}), 201
 
 @library_bp.delete("/remove/<int:movie_id>")
@@ -50,5 +162,83 @@ def remove_from_library(movie_id: int):
     if not item:
         return jsonify({"error": "Not found"}), 404
     db.session.delete(item)
+    _bump_library_version(current_user.id)
     db.session.commit()
-    return jsonify({"message": "Removed", "movie_id": movie_id}), 200
\ No newline at end of file
+    invalidate_user_recommendations(current_user.id)
+    local_engine.record_remove(current_user.id, movie_id)
+    return jsonify({"message": "Removed", "movie_id": movie_id}), 200
+
+
+@library_bp.post("/bulk")
+@login_required
+def bulk_import():
+    """Import many movies at once (e.g. a Letterboxd or IMDb list).
+    Body: text/csv with a header row, or JSON [ {...} ] / { "movies": [...] }.
+    Each row needs a TMDB id (id / movie_id / tmdb_id) and a title; rows
+    with only a title (and year) are matched against the local movie index.
+    Returns per-row results with status added | exists | invalid. The
+    import is all-or-nothing: an unreadable body adds nothing.
+    """
+    content_type = request.mimetype or ""
+    body = None if "csv" in content_type else request.get_data()
+
+    try:
+        results, added = import_rows(current_user.id, read_rows(body, request.stream, content_type))
+        if added:
+            _bump_library_version(current_user.id)
+        db.session.commit()
+    except (ValueError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({ "error": f"Could not read import: {e}" }), 400
+    except SQLAlchemyError:
+        db.session.rollback()
+        logger.exception("Bulk import for user %s failed", current_user.id)
+        return jsonify({ "error": "Could not save import" }), 500
+
+    if added:
+        invalidate_user_recommendations(current_user.id)
+        local_engine.invalidate()
+
+    summary = {status: sum(1 for r in results if r["status"] == status) for status in ("added", "exists", "invalid")}
+    return jsonify({ "summary": summary, "results": results }), 200
+
+
+@library_bp.get("/export")
+@login_required
+def export_library():
+    """Stream the library as CSV (default) or JSON: ?format=csv|json"""
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "json"):
+        return jsonify({ "error": "format must be csv or json" }), 400
+
+    user_id = current_user.id
+
+    def rows_as_dicts():
+        for row in export_rows(user_id):
+            item = dict(zip(EXPORT_FIELDS, row))
+            item["created_at"] = item["created_at"].isoformat() + "Z"
+            yield item
+
+    def as_csv():
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        for item in rows_as_dicts():
+            writer.writerow(item)
+            if buf.tell() > 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+
+    def as_json():
+        yield "["
+        for i, item in enumerate(rows_as_dicts()):
+            yield ("," if i else "") + json.dumps(item)
+        yield "]"
+
+    return Response(
+        stream_with_context(as_csv() if fmt == "csv" else as_json()),
+        mimetype="text/csv" if fmt == "csv" else "application/json",
+        headers={"Content-Disposition": f"attachment; filename=library.{fmt}"},
+    )
@@ -1,13 +1,40 @@
 import os
 from flask import Blueprint, request, jsonify
-from services.tmdb import search_movies, get_popular_movies, get_movie_details
+from services.tmdb import search_movies, get_popular_movies
+from services.movie_documents import SECTIONS, get_movie_document, document_etag, render_document
+from config import Config
+from services.resolution_index import index_movies
+from services.search_index import search_index
+from services.cache_warmer import record_search_query
+from extensions.http_cache import conditional_json, conditional_body, not_modified
+from services.token_bucket import RateLimited
 
 movies_bp = Blueprint("movies", __name__)
 
 TMDB_IMAGE_BASE = os.getenv("TMDB_IMAGE_BASE")
 
+# Browser/CDN cache lifetimes for the public movie routes (seconds)
+SEARCH_MAX_AGE = 300
+POPULAR_MAX_AGE = 600
+DETAILS_MAX_AGE = 3600
+
+def _search_result(m: dict) -> dict:
+    return {
+        "id": m.get("id"),
+        "title": m.get("title"),
+        "overview": m.get("overview"),
+        "poster_url": f"{m['poster_path']}" if m.get("poster_path") else None,
+        "release_date": m.get("release_date"),
+        "vote_average": m.get("vote_average"),
+    }
+
 @movies_bp.get("/search")
 def search_movies_route():
+    """Page 1 is answered from the local search index when it holds every
+    local match (at most one page) and at least SEARCH_LOCAL_MIN_RESULTS
+    of them. Anything larger goes to TMDB, so all pages of a query come
+    from the same source; so do other pages and local misses.
+    """
     query = (request.args.get("q") or "").strip()
     page = request.args.get("page", default=1, type=int)
 
@@ -15,24 +42,29 @@ def search_movies_route():
         return jsonify({ "results": [], "message": "No search query provided."}), 200
     
     try:
+        if page == 1:
+            record_search_query(query)
+            local, complete = search_index.search(query, limit=Config.SEARCH_PAGE_SIZE)
+            if complete and len(local) >= Config.SEARCH_LOCAL_MIN_RESULTS:
+                return conditional_json({
+                    "results": [_search_result(m) for m in local],
+                    "page": 1,
+                    "total_results": len(local),
+                    "total_pages": 1,
+                    "source": "local",
+                }, max_age=SEARCH_MAX_AGE, public=True)
+
         data = search_movies(query, page)
-        results = [
-            {
-                "id": m.get("id"),
-                "title": m.get("title"),
-                "overview": m.get("overview"),
-                "poster_url": f"{m['poster_path']}" if m.get("poster_path") else None,
-                "release_date": m.get("release_date"),
-                "vote_average": m.get("vote_average"),
-            }
-            for m in data.get("results", [])
-        ]
-        return jsonify({
-            "results": results,
+        index_movies(data.get("results", []))
+        return conditional_json({
+            "results": [_search_result(m) for m in data.get("results", [])],
             "page": data.get("page"),
             "total_results": data.get("total_results"),
-            "total_pages": data.get("total_pages")
-        }), 200
+            "total_pages": data.get("total_pages"),
+            "source": "tmdb",
+        }, max_age=SEARCH_MAX_AGE, public=True)
+    except RateLimited:
+        raise
     except Exception as e:
         return jsonify({ "error": str(e)}), 500
     
@@ -42,71 +74,41 @@ def get_popular_movies_route():
 
     try:
         data = get_popular_movies(page)
-        results = [
-            {
-                "id": m.get("id"),
-                "title": m.get("title"),
-                "overview": m.get("overview"),
-                "poster_url": f"{m['poster_path']}" if m.get("poster_path") else None,
-                "release_date": m.get("release_date"),
-                "vote_average": m.get("vote_average"),
-            }
-            for m in data.get("results", [])
-        ]
-        return jsonify({
-            "results": results,
+        index_movies(data.get("results", []))
+        return conditional_json({
+            "results": [_search_result(m) for m in data.get("results", [])],
             "page": data.get("page"),
             "total_results": data.get("total_results"),
             "total_pages": data.get("total_pages")
-        }), 200
+        }, max_age=POPULAR_MAX_AGE, public=True)
+    except RateLimited:
+        raise
     except Exception as e:
         return jsonify({ "error": str(e)}), 500
 
 @movies_bp.get("/<int:movie_id>")
 def get_movie_details_route(movie_id: int):
+    """Movie details in our frontend-friendly shape.
+    Optional query param include=videos,cast,crew limits the response to
+    the listed sections (include= with no value returns only core fields).
+    All sections are returned when it is omitted.
+    """
+    include = request.args.get("include")
+    if include is None:
+        sections = SECTIONS
+    else:
+        wanted = {s.strip() for s in include.split(",") if s.strip()}
+        sections = tuple(s for s in SECTIONS if s in wanted)
+
     try:
-        m = get_movie_details(movie_id)
-        # Map TMDB shape to our frontend-friendly shape
-        result = {
-            "id": m.get("id"),
-            "title": m.get("title"),
-            "tagline": m.get("tagline"),
-            "overview": m.get("overview"),
-            "poster_url": m.get("poster_path"),
-            "backdrop_url": m.get("backdrop_path"),
-            "release_date": m.get("release_date"),
-            "vote_average": m.get("vote_average"),
-            "runtime": m.get("runtime"),
-            "genres": [g.get("name") for g in m.get("genres", []) if g.get("name")],
-            "homepage": m.get("homepage"),
-            "videos": [
-                {
-                    "id": v.get("id"),
-                    "key": v.get("key"),
-                    "name": v.get("name"),
-                    "site": v.get("site"),
-                    "type": v.get("type"),
-                }
-                for v in (m.get("videos", {}) or {}).get("results", [])
-            ],
-            "cast": [
-                {
-                    "id": c.get("id"),
-                    "name": c.get("name"),
-                    "character": c.get("character"),
-                    "profile_path": c.get("profile_path"),
-                }
-                for c in (m.get("credits", {}) or {}).get("cast", [])[:15]
-            ],
-            "crew": [
-                {
-                    "id": c.get("id"),
-                    "name": c.get("name"),
-                    "job": c.get("job"),
-                }
-                for c in (m.get("credits", {}) or {}).get("crew", [])
-            ],
-        }
-        return jsonify(result), 200
+        doc = get_movie_document(movie_id)
+        etag = document_etag(doc, sections)
+
+        cached = not_modified(etag, max_age=DETAILS_MAX_AGE, public=True)
+        if cached is not None:
+            return cached
+        return conditional_body(render_document(doc, sections), etag, max_age=DETAILS_MAX_AGE, public=True)
+    except RateLimited:
+        raise
     except Exception as e:
         return jsonify({ "error": str(e) }), 500
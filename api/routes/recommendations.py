@@ -1,12 +1,18 @@
-from flask import Blueprint, json, request, jsonify
+import json
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_login import login_required, current_user
 
-from app import db
-from models.library_item import LibraryItem
-
-from services.recommendationService import join_user_libraries
-from services.openai import generate_recommendations
-from services.tmdb import search_movies
+from config import Config
+from services.jobs import submit_recommendation_job, get_job
+from services.recommendationService import (
+    RECOMMENDATION_BACKENDS,
+    generate_group_recommendations,
+    resolve_stream,
+    group_fingerprint,
+    get_cached_recommendations,
+    cache_recommendations,
+)
+from services.token_bucket import RateLimited
 
 recommendations_bp = Blueprint("recommendations", __name__)
 
@@ -14,9 +20,13 @@ recommendations_bp = Blueprint("recommendations", __name__)
 @recommendations_bp.post("")
 @login_required
 def get_recommendations():
-    """Return grouped user libraries in a tidy shape.
-    Accepts JSON body only: { "user_ids": [1, 2, 3] }
-    }
+    """Start generating recommendations for a group.
+    Accepts JSON body only: { "user_ids": [1, 2, 3], "backend": "local" | "llm" }
+    "backend" is optional and defaults to RECS_BACKEND.
+
+    Returns 202 with { "job_id", "status" }; poll GET /api/recs/<job_id>
+    for the results. Returns 200 with the results straight away (and a
+    null job_id) when the group's recommendations are already cached.
     """
     data = request.get_json(silent=True) or {}
     body_ids = data.get("user_ids")
@@ -34,35 +44,100 @@ def get_recommendations():
     if len(user_ids) == 0:
         return jsonify({"data": {}}), 200
 
+    backend = data.get("backend") or Config.RECS_BACKEND
+    if backend not in RECOMMENDATION_BACKENDS:
+        return jsonify({"error": f"backend must be one of: {', '.join(RECOMMENDATION_BACKENDS)}"}), 400
+
     try:
-        from models.user import User
-        
-        
-        group_lib = join_user_libraries(user_ids)
-        recs = generate_recommendations(group_lib)
-        
-     
+        job = submit_recommendation_job(user_ids, backend, current_user.id)
+        return jsonify(job.to_dict()), 200 if job.status == "done" else 202
+    except RateLimited:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        try:
-            results = []
-            for rec in recs["recommendations"]:
-                m = search_movies(rec["title"], 1)["results"][0]
-
-                results.append({
-                    "id": m.get("id"),
-                    "title": m.get("title"),
-                    "overview": m.get("overview"),
-                    "poster_url": f"{m['poster_path']}" if m.get("poster_path") else None,
-                    "release_date": m.get("release_date"),
-                    "vote_average": m.get("vote_average"),
-                    "why": rec["why"]
-                })
-
-            print(json.dumps(results, indent=2))
 
-        except Exception as e:
-            print(e)
+@recommendations_bp.get("/<job_id>")
+@login_required
+def get_recommendation_job(job_id: str):
+    """Poll a recommendation job started by POST /api/recs.
+    Only members of the group can see it.
+    """
+    job = get_job(job_id)
+    if job is None or current_user.id not in job.user_ids:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(job.to_dict()), 200
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@recommendations_bp.post("/stream")
+@login_required
+def stream_recommendations_route():
+    """Server-Sent Events variant of POST /api/recs.
+    Accepts the same body: { "user_ids": [1, 2, 3], "backend": "local" | "llm" }
+
+    Emits an `item` event ({ "index": n, "movie": {...} }) for each
+    recommendation as soon as its TMDB match resolves, then a `done`
+    event. Items can arrive out of order; `index` is the backend's order.
+    """
+    data = request.get_json(silent=True) or {}
+    body_ids = data.get("user_ids")
 
-        return jsonify({"results": results}), 200
+    if body_ids is None:
+        return jsonify({"error": "Missing user_ids in request body"}), 400
+
+    try:
+        user_ids = [int(x) for x in body_ids]
+        user_ids.append(current_user.id)
+    except (TypeError, ValueError):
+        return jsonify({"error": "user_ids must be a list of integers"}), 400
+
+    backend = data.get("backend") or Config.RECS_BACKEND
+    if backend not in RECOMMENDATION_BACKENDS:
+        return jsonify({"error": f"backend must be one of: {', '.join(RECOMMENDATION_BACKENDS)}"}), 400
+
+    try:
+        fingerprint = group_fingerprint(user_ids)
+        cached, recs = get_cached_recommendations(f"{backend}:{fingerprint}"), None
+        if cached is None:
+            backend, cached, recs = generate_group_recommendations(user_ids, backend, stream=True, fingerprint=fingerprint)
+    except RateLimited:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+    def events():
+        if cached is not None:
+            for index, movie in enumerate(cached):
+                yield _sse("item", {"index": index, "movie": movie})
+            yield _sse("done", {"count": len(cached)})
+            return
+
+        resolved, report, failed = {}, {}, False
+        stream = resolve_stream(recs, report=report)
+        try:
+            for index, movie in stream:
+                resolved[index] = movie
+                yield _sse("item", {"index": index, "movie": movie})
+        except Exception as e:
+            failed = True
+            yield _sse("error", {"error": str(e)})
+        finally:
+            # Also runs when the client disconnects: stops the LLM stream
+            # and pending lookups
+            stream.close()
+
+        results = [resolved[i] for i in sorted(resolved)]
+        # A truncated stream must not become the group's cached result
+        if results and not failed and not report.get("failed"):
+            cache_recommendations(f"{backend}:{fingerprint}", user_ids, results)
+        yield _sse("done", {"count": len(results)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,128 @@
+"""Latency benchmark for the TMDB client against a local stub server.
+
+Compares the pooled keep-alive session in services/tmdb.py with one
+requests.get per call (the old behaviour). Run from the api directory:
+
+    python scripts/bench_tmdb.py --requests 500 --concurrency 8
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PAYLOAD = json.dumps({
+    "page": 1,
+    "results": [{"id": i, "title": f"Movie {i}", "poster_path": None} for i in range(20)],
+    "total_pages": 1,
+    "total_results": 20,
+}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    delay = 0.0
+    throttle_every = 0
+    _count = 0
+    _lock = threading.Lock()
+
+    def do_GET(self):
+        with StubHandler._lock:
+            StubHandler._count += 1
+            n = StubHandler._count
+        if self.delay:
+            time.sleep(self.delay)
+        if self.throttle_every and n % self.throttle_every == 0:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+def percentiles(samples: list[float]) -> dict:
+    qs = statistics.quantiles(samples, n=100)
+    return {"p50": qs[49], "p95": qs[94], "p99": qs[98], "max": max(samples)}
+
+
+def run(label: str, call, total: int, concurrency: int):
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            call()
+            ok = True
+        except Exception:
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - start
+
+    p = percentiles([ms for ms, _ in outcomes])
+    errors = sum(1 for _, ok in outcomes if not ok)
+    print(
+        f"{label:<12} p50={p['p50']:.2f}ms p95={p['p95']:.2f}ms "
+        f"p99={p['p99']:.2f}ms max={p['max']:.2f}ms  "
+        f"{total / elapsed:.0f} req/s  errors={errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="stub server latency")
+    parser.add_argument("--throttle-every", type=int, default=0, help="answer every Nth call with 429")
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay_ms / 1000
+    StubHandler.throttle_every = args.throttle_every
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    os.environ["TMDB_BASE_URL"] = base_url
+    os.environ.setdefault("TMDB_API_KEY", "bench")
+    # The global TMDB budget would throttle the pooled run only
+    os.environ["UPSTREAM_RATE_TMDB"] = "0"
+
+    import requests
+    from services import tmdb
+
+    params = {"query": "bench", "page": 1}
+
+    # Same headers as the pooled session, so only connection reuse differs
+    headers = dict(tmdb.session.headers)
+
+    def unpooled():
+        resp = requests.get(f"{base_url}/search/movie", params=params, headers=headers, timeout=tmdb.TIMEOUT)
+        resp.raise_for_status()
+
+    def pooled():
+        # Bypass the response cache so every call hits the stub
+        tmdb._fetch("/search/movie", params)
+
+    run("per-call", unpooled, args.requests, args.concurrency)
+    run("pooled", pooled, args.requests, args.concurrency)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
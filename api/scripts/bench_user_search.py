@@ -0,0 +1,126 @@
+"""Latency benchmark for user search against a throwaway SQLite database.
+
+Compares the old leading-wildcard ILIKE scan with services/user_search.py
+as the user table grows. Run from the api directory:
+
+    python scripts/bench_user_search.py --sizes 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIRST = ["james", "maria", "john", "wei", "fatima", "olga", "pedro", "aiko", "liam", "noor",
+         "sofia", "omar", "chen", "emma", "ivan", "lucia", "kofi", "anna", "raj", "mia"]
+LAST = ["smith", "garcia", "nguyen", "kowalski", "okafor", "silva", "tanaka", "muller",
+        "haddad", "novak", "rossi", "jensen", "patel", "kim", "dubois", "costa"]
+DOMAINS = ["gmail.com", "outlook.com", "proton.me", "example.org"]
+
+QUERIES = {
+    "prefix-short": "jo",
+    "prefix-full": "maria gar",
+    "substring": "owals",
+    "email": "pedro.silva12",
+    "miss": "zzqx",
+}
+
+
+def percentiles(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {"p50": statistics.median(samples), "p95": samples[int(len(samples) * 0.95) - 1]}
+
+
+def fake_users(start: int, count: int, rng: random.Random):
+    for i in range(start, start + count):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        yield {
+            "id": i,
+            "email": f"{first}.{last}{i}@{rng.choice(DOMAINS)}",
+            "password_hash": "x",
+            "display_name": f"{first.title()} {last.title()}",
+            "library_version": 0,
+        }
+
+
+def grow(db, target: int, rng: random.Random) -> None:
+    from models.user import User
+    from models.user_search_gram import UserSearchGram
+    from services.user_search import user_grams
+
+    current = db.session.query(User).count()
+    batch = 5000
+    for start in range(current + 1, target + 1, batch):
+        users = list(fake_users(start, min(batch, target + 1 - start), rng))
+        db.session.execute(db.insert(User), users)
+        db.session.execute(db.insert(UserSearchGram), [
+            {"gram": g, "user_id": u["id"]}
+            for u in users
+            for g in user_grams(u["display_name"], u["email"])
+        ])
+        db.session.commit()
+    db.session.execute(db.text("ANALYZE"))
+
+
+def old_search(q: str):
+    from sqlalchemy import or_
+    from models.user import User
+
+    pattern = f"%{q}%"
+    return (
+        User.query
+        .filter(User.id != 0, or_(User.display_name.ilike(pattern), User.email.ilike(pattern)))
+        .order_by(User.display_name.asc())
+        .limit(10)
+        .all()
+    )
+
+
+def timed(fn, q: str, repeats: int) -> list[float]:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(q)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_users.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    from app import app, db
+    from services.user_search import search_users
+
+    rng = random.Random(42)
+    with app.app_context():
+        db.create_all()
+        for size in (int(s) for s in args.sizes.split(",")):
+            start = time.perf_counter()
+            grow(db, size, rng)
+            print(f"\n{size:,} users (built in {time.perf_counter() - start:.1f}s)")
+
+            for label, q in QUERIES.items():
+                old = percentiles(timed(old_search, q, args.repeats))
+                new = percentiles(timed(lambda q: search_users(q, exclude_id=0), q, args.repeats))
+                print(
+                    f"  {label:<13} ilike p50={old['p50']:8.2f}ms p95={old['p95']:8.2f}ms"
+                    f"   indexed p50={new['p50']:6.2f}ms p95={new['p95']:6.2f}ms"
+                )
+                db.session.rollback()
+
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
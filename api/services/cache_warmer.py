@@ -0,0 +1,231 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from requests import HTTPError
+
+from app import db
+from config import Config
+from models.library_item import LibraryItem
+from services import tmdb
+from services.movie_documents import store_movie_details
+from services.leases import acquire_lease, release_lease
+from services.resolution_index import index_movies
+
+logger = logging.getLogger(__name__)
+
+LEASE = "cache-warmer"
+
+TOP_SEARCHES_KEY = "tmdb:top_searches"
+TOP_SEARCHES_KEEP = 500
+TOP_SEARCHES_TTL = 7 * 86400
+# Stored counts fade on every flush so "top" tracks recent traffic
+TOP_SEARCHES_DECAY = 0.9
+
+_search_counts = Counter()
+_search_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+# === SEARCH STATS ===
+
+def record_search_query(query: str) -> None:
+    """Count a search; counts are flushed into the TMDB cache periodically."""
+    global _last_flush
+    query = tmdb.normalize_query(query)
+    if not query:
+        return
+
+    with _search_lock:
+        _search_counts[query] += 1
+        if time.monotonic() - _last_flush < Config.SEARCH_STATS_FLUSH_SECONDS:
+            return
+        pending = dict(_search_counts)
+        _search_counts.clear()
+        _last_flush = time.monotonic()
+    _flush_search_counts(pending)
+
+
+def _flush_search_counts(pending: dict) -> None:
+    # Read-modify-write: concurrent flushes from other workers can drop a
+    # few counts, which is fine for picking what to warm
+    stored = tmdb.cache.get(TOP_SEARCHES_KEY) or {}
+    merged = Counter({q: c * TOP_SEARCHES_DECAY for q, c in stored.items()})
+    merged.update(pending)
+    tmdb.cache.set(TOP_SEARCHES_KEY, dict(merged.most_common(TOP_SEARCHES_KEEP)), TOP_SEARCHES_TTL)
+
+
+def top_search_queries(n: int) -> list[str]:
+    counts = Counter(tmdb.cache.get(TOP_SEARCHES_KEY) or {})
+    with _search_lock:
+        counts.update(_search_counts)
+    return [q for q, _ in counts.most_common(n)]
+
+
+def most_saved_movie_ids(n: int) -> list[int]:
+    count = db.func.count(LibraryItem.id)
+    rows = db.session.execute(
+        db.select(LibraryItem.movie_id)
+        .group_by(LibraryItem.movie_id)
+        .order_by(count.desc(), LibraryItem.movie_id)
+        .limit(n)
+    )
+    return [movie_id for (movie_id,) in rows]
+
+
+# === WARMING ===
+
+class Pacer:
+    """Spaces upstream requests to at most `rate` per second.
+
+    After a 429 it waits out Retry-After and halves its rate; each success
+    recovers some of it.
+    """
+
+    MAX_PENALTY = 16
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.penalty = 1.0
+        self.requests = 0
+        self._next = 0.0
+
+    def __call__(self) -> None:
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval * self.penalty
+        self.requests += 1
+
+    def throttled(self, retry_after: float) -> None:
+        self.penalty = min(self.penalty * 2, self.MAX_PENALTY)
+        self._next = max(self._next, time.monotonic() + retry_after)
+
+    def recovered(self) -> None:
+        self.penalty = max(1.0, self.penalty * 0.75)
+
+
+def retry_after_seconds(e: HTTPError) -> float:
+    try:
+        return float(e.response.headers.get("Retry-After", 1))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def _run_phase(name: str, items: list, fn, pacer: Pacer, report) -> dict:
+    done = failed = 0
+    step = max(1, len(items) // 10)
+    started = time.monotonic()
+
+    for i, item in enumerate(items, start=1):
+        for attempt in range(2):
+            try:
+                fn(item)
+                pacer.recovered()
+                done += 1
+                break
+            except HTTPError as e:
+                if e.response is not None and e.response.status_code == 429 and attempt == 0:
+                    pacer.throttled(retry_after_seconds(e))
+                    continue
+                failed += 1
+                logger.warning("Cache warm %s %r failed: %s", name, item, e)
+                break
+            except Exception as e:
+                failed += 1
+                logger.warning("Cache warm %s %r failed: %s", name, item, e)
+                break
+
+        if i % step == 0 or i == len(items):
+            report(f"[{name}] {i}/{len(items)} done, {failed} failed, {pacer.requests} upstream requests")
+
+    return {"total": len(items), "done": done, "failed": failed, "seconds": round(time.monotonic() - started, 2)}
+
+
+def warm_caches(
+    popular_pages: int | None = None,
+    top_movies: int | None = None,
+    top_searches: int | None = None,
+    rate: float | None = None,
+    refresh: bool = False,
+    report=logger.info,
+) -> dict:
+    """Pre-fetch popular pages, the top recent searches and the details of
+    the most-saved library movies into the TMDB cache and document store.
+
+    Cached entries are skipped (served from cache) unless refresh=True.
+    Needs an app context. Returns per-phase counts.
+    """
+    popular_pages = Config.CACHE_WARM_POPULAR_PAGES if popular_pages is None else popular_pages
+    top_movies = Config.CACHE_WARM_TOP_MOVIES if top_movies is None else top_movies
+    top_searches = Config.CACHE_WARM_TOP_SEARCHES if top_searches is None else top_searches
+    pacer = Pacer(Config.CACHE_WARM_RATE if rate is None else rate)
+
+    def popular(page):
+        index_movies(tmdb.get_popular_movies(page, refresh=refresh).get("results", []))
+
+    def search(query):
+        index_movies(tmdb.search_movies(query, 1, refresh=refresh).get("results", []))
+
+    def details(movie_id):
+        store_movie_details(tmdb.get_movie_details(movie_id, refresh=refresh))
+
+    phases = [
+        ("popular", list(range(1, popular_pages + 1)), popular),
+        ("searches", top_search_queries(top_searches), search),
+        ("details", most_saved_movie_ids(top_movies), details),
+    ]
+
+    summary = {}
+    tmdb.set_pacer(pacer)
+    try:
+        for name, items, fn in phases:
+            summary[name] = _run_phase(name, items, fn, pacer, report)
+    finally:
+        tmdb.set_pacer(None)
+
+    summary["upstream_requests"] = pacer.requests
+    return summary
+
+
+def start_cache_warmer(app) -> threading.Thread:
+    """Warm caches on a daemon thread, then every CACHE_WARM_INTERVAL
+    seconds (0 warms once).
+
+    The memory cache is per process, so every worker warms its own. With
+    the shared sqlite cache only the worker holding the "cache-warmer"
+    lease warms; the others keep checking in case it goes away.
+    """
+    interval = Config.CACHE_WARM_INTERVAL
+    lease = Config.BACKGROUND_LEASE_SECONDS
+    shared = Config.TMDB_CACHE_BACKEND.lower() == "sqlite"
+
+    def run():
+        while True:
+            with app.app_context():
+                try:
+                    if not shared:
+                        logger.info("Cache warm finished: %s", warm_caches())
+                    elif acquire_lease(LEASE, lease):
+                        try:
+                            logger.info("Cache warm finished: %s", warm_caches())
+                        finally:
+                            if interval > 0:
+                                # Keep the lease through the sleep
+                                acquire_lease(LEASE, interval + lease)
+                            else:
+                                release_lease(LEASE)
+                    elif interval <= 0:
+                        # Another worker is warming the shared cache right now
+                        return
+                except Exception as e:
+                    logger.exception("Cache warm failed: %s", e)
+            if interval <= 0:
+                return
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="cache-warmer", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,55 @@
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from app import db
+from config import Config
+from models.user import User
+from services.cache import MemoryCache
+
+# Per-process cache of session identities, so authenticated requests don't
+# query users. Entries are dropped when this process changes the user;
+# other processes see the change once the TTL expires.
+_identities = MemoryCache(max_entries=Config.IDENTITY_CACHE_MAX_ENTRIES)
+
+
+class SessionUser(UserMixin):
+    """Read-only identity for current_user; not attached to a DB session."""
+    __slots__ = ("id", "email", "display_name")
+
+    def __init__(self, id: int, email: str, display_name: str):
+        self.id = id
+        self.email = email
+        self.display_name = display_name
+
+    def __repr__(self):
+        return f"<SessionUser {self.id}>"
+
+
+def identity_cache_stats() -> dict:
+    return _identities.stats()
+
+
+def load_identity(user_id: int) -> SessionUser | None:
+    identity = _identities.get(user_id)
+    if identity is not None:
+        return identity
+
+    row = db.session.execute(
+        db.select(User.id, User.email, User.display_name).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+
+    identity = SessionUser(*row)
+    _identities.set(user_id, identity, Config.IDENTITY_CACHE_TTL)
+    return identity
+
+
+def invalidate_identity(user_id: int) -> None:
+    _identities.delete(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, user):
+    invalidate_identity(user.id)
@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from config import Config
+from extensions.log import bind_request_id
+from models.recommendation_job import RecommendationJob
+from services.recommendationService import (
+    generate_group_recommendations,
+    resolve_recommendations,
+    group_fingerprint,
+    get_cached_recommendations,
+    cache_recommendations,
+)
+
+logger = logging.getLogger(__name__)
+
+# Recommendation generation runs here instead of on the request thread
+_job_pool = ThreadPoolExecutor(
+    max_workers=Config.RECS_JOB_WORKERS,
+    thread_name_prefix="recs-job",
+)
+
+# Serializes the in-flight check + insert so concurrent identical POSTs
+# in this process share one job
+_submit_lock = threading.Lock()
+
+ACTIVE = ("queued", "running")
+
+PURGE_INTERVAL = 3600
+_last_purge = 0.0
+
+
+def _stale_before() -> datetime:
+    return datetime.now() - timedelta(seconds=Config.RECS_JOB_STALE_SECONDS)
+
+
+def submit_recommendation_job(user_ids: list[int], backend: str, requested_by: int) -> RecommendationJob:
+    """Queue recommendation generation for a group and return the job.
+
+    A cached result produces an already-finished job that is not stored
+    (its job_id is None), and an identical group request that is still in
+    flight is returned instead of starting a new one.
+    """
+    dedupe_key = f"{backend}:{group_fingerprint(user_ids)}"
+
+    cached = get_cached_recommendations(dedupe_key)
+    if cached is not None:
+        now = datetime.now()
+        return RecommendationJob(
+            requested_by=requested_by,
+            user_ids=sorted(set(user_ids)),
+            backend=backend,
+            dedupe_key=dedupe_key,
+            status="done",
+            results=cached,
+            created_at=now,
+            finished_at=now,
+        )
+
+    _maybe_purge()
+    with _submit_lock:
+        in_flight = (
+            RecommendationJob.query
+            .filter(
+                RecommendationJob.dedupe_key == dedupe_key,
+                RecommendationJob.status.in_(ACTIVE),
+                RecommendationJob.created_at >= _stale_before(),
+            )
+            .order_by(RecommendationJob.created_at.desc())
+            .first()
+        )
+        if in_flight is not None:
+            return in_flight
+
+        job = RecommendationJob(
+            requested_by=requested_by,
+            user_ids=sorted(set(user_ids)),
+            backend=backend,
+            dedupe_key=dedupe_key,
+        )
+        db.session.add(job)
+        db.session.commit()
+
+    _job_pool.submit(bind_request_id(_run_job), current_app._get_current_object(), job.id)
+    return job
+
+
+def purge_old_jobs(retention_hours: int | None = None) -> int:
+    """Delete jobs created more than `retention_hours` ago. Returns the count.
+
+    Anything that old is finished: active jobs fail after
+    RECS_JOB_STALE_SECONDS.
+    """
+    hours = Config.RECS_JOB_RETENTION_HOURS if retention_hours is None else retention_hours
+    cutoff = datetime.now() - timedelta(hours=hours)
+    deleted = (
+        RecommendationJob.query
+        .filter(RecommendationJob.created_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    return deleted
+
+
+def _maybe_purge() -> None:
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < PURGE_INTERVAL:
+        return
+    _last_purge = now
+    try:
+        deleted = purge_old_jobs()
+        if deleted:
+            logger.info("Purged %d old recommendation jobs", deleted)
+    except Exception:
+        db.session.rollback()
+        logger.exception("Purging old recommendation jobs failed")
+
+
+def _run_job(app, job_id: str) -> None:
+    with app.app_context():
+        job = db.session.get(RecommendationJob, job_id)
+        if job is None or job.status != "queued":
+            return
+        job.status = "running"
+        db.session.commit()
+
+        try:
+            fingerprint = job.dedupe_key.partition(":")[2]
+            backend, results, recs = generate_group_recommendations(job.user_ids, job.backend, fingerprint=fingerprint)
+            if results is None:
+                report = {}
+                results = resolve_recommendations(recs, report=report)
+                # A lookup failed or timed out: don't pin a partial result for the TTL
+                if results and not report["failed"]:
+                    cache_recommendations(f"{backend}:{fingerprint}", job.user_ids, results)
+            job.status = "done"
+            job.results = results
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Recommendation job %s failed", job_id)
+            job.status = "failed"
+            job.error = str(e)
+
+        job.finished_at = datetime.now()
+        db.session.commit()
+
+
+def get_job(job_id: str) -> RecommendationJob | None:
+    """Load a job, failing it if its worker died (e.g. a restart mid-job)."""
+    job = db.session.get(RecommendationJob, job_id)
+    if job is not None and job.status in ACTIVE and job.created_at < _stale_before():
+        job.status = "failed"
+        job.error = "Job timed out"
+        job.finished_at = datetime.now()
+        db.session.commit()
+    return job
@@ -0,0 +1,48 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from app import db
+from models.worker_lease import WorkerLease
+from services.upsert import insert_for
+
+# Identifies this process across hosts and pid reuse
+HOLDER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(name: str, seconds: float) -> bool:
+    """Take or extend the `name` lease for `seconds`. Returns False while
+    another process holds an unexpired one, so every worker can call this
+    and only one runs the task. Needs an app context.
+    """
+    now = datetime.now()
+    expires_at = now + timedelta(seconds=seconds)
+
+    db.session.execute(
+        insert_for(WorkerLease)
+        .values(name=name, holder="", expires_at=now)
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    # One conditional UPDATE, so two processes can't both win
+    result = db.session.execute(
+        db.update(WorkerLease)
+        .where(
+            WorkerLease.name == name,
+            (WorkerLease.holder == HOLDER) | (WorkerLease.expires_at <= now),
+        )
+        .values(holder=HOLDER, expires_at=expires_at)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def release_lease(name: str) -> None:
+    """Let another process take `name` right away, if this one holds it."""
+    db.session.execute(
+        db.update(WorkerLease)
+        .where(WorkerLease.name == name, WorkerLease.holder == HOLDER)
+        .values(expires_at=datetime.now())
+    )
+    db.session.commit()
+
@@ -0,0 +1,179 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from app import db
+from models.library_item import LibraryItem
+from services.resolution_index import lookup, release_year
+from services.upsert import insert_for
+
+BATCH_SIZE = 500
+MAX_ITEMS = 10000
+MAX_POSTER_PATH = 255  # LibraryItem.poster_path column size
+MAX_MOVIE_ID = 2**31 - 1
+
+EXPORT_FIELDS = ("movie_id", "title", "poster_path", "release_date", "vote_average", "created_at")
+
+# Column aliases accepted on import, including Letterboxd/IMDb export headers
+_ID_KEYS = ("movie_id", "id", "tmdb_id", "tmdbID")
+_TITLE_KEYS = ("title", "Title", "Name", "name")
+_YEAR_KEYS = ("year", "Year")
+
+
+def _first(row: dict, keys) -> str | None:
+    for key in keys:
+        value = row.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _optional_float(value):
+    return float(value) if value not in (None, "") else None
+
+
+def _optional_str(row: dict, key: str) -> str | None:
+    value = row.get(key)
+    if value in (None, ""):
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be a string")
+    return value
+
+
+def normalize_row(row) -> dict:
+    """Validate one import row into LibraryItem column values.
+
+    Rows without a TMDB id are matched by title (+ year) against the local
+    resolution index only, so imports never wait on TMDB. Raises
+    ValueError with a user-facing message on invalid rows.
+    """
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+
+    title = _first(row, _TITLE_KEYS)
+    movie_id = _first(row, _ID_KEYS)
+    if not title:
+        raise ValueError("Missing title")
+
+    release_date = _optional_str(row, "release_date")
+    poster_path = _optional_str(row, "poster_path")
+    if poster_path and len(poster_path) > MAX_POSTER_PATH:
+        raise ValueError("poster_path is too long")
+    if movie_id is None:
+        year = _first(row, _YEAR_KEYS)
+        match = lookup(str(title), int(year) if year and str(year).isdigit() else release_year(release_date))
+        if match is None:
+            raise ValueError("Missing TMDB id and title could not be matched")
+        return {
+            "movie_id": match["id"],
+            "title": match["title"][:255],
+            "poster_path": match.get("poster_path"),
+            "release_date": match.get("release_date") or None,
+            "vote_average": match.get("vote_average"),
+        }
+
+    try:
+        # JSON true/false would otherwise pass as 1/0
+        if isinstance(movie_id, bool) or isinstance(row.get("vote_average"), bool):
+            raise TypeError
+        movie_id = int(movie_id)
+        vote_average = _optional_float(row.get("vote_average"))
+    except (TypeError, ValueError):
+        raise ValueError("id and vote_average must be numbers")
+    if not 0 < movie_id <= MAX_MOVIE_ID:
+        raise ValueError("id is out of range")
+
+    return {
+        "movie_id": movie_id,
+        "title": str(title)[:255],
+        "poster_path": poster_path,
+        "release_date": release_date[:10] if release_date else None,
+        "vote_average": vote_average,
+    }
+
+
+def read_rows(body: bytes | None, stream, content_type: str) -> Iterator:
+    """Yield raw rows from a CSV stream or a JSON array / { "movies": [...] } body."""
+    if "csv" in (content_type or ""):
+        yield from csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+        return
+
+    data = json.loads(body or b"null")
+    if isinstance(data, dict):
+        data = data.get("movies")
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of movies or { \"movies\": [...] }")
+    yield from data
+
+
+def _insert_batch(user_id: int, batch: list[tuple[int, dict]], results: list[dict]) -> list[dict]:
+    """Insert one batch with ON CONFLICT DO NOTHING; return rows actually added.
+    Not committed here: the caller commits the whole import at once.
+    """
+    now = datetime.now()
+    values = [{**item, "user_id": user_id, "created_at": now} for _, item in batch]
+
+    stmt = (insert_for(LibraryItem)
+            .values(values)
+            .on_conflict_do_nothing(index_elements=["user_id", "movie_id"])
+            .returning(LibraryItem.movie_id))
+    added = {movie_id for (movie_id,) in db.session.execute(stmt)}
+
+    for row_number, item in batch:
+        results.append({
+            "row": row_number,
+            "movie_id": item["movie_id"],
+            "status": "added" if item["movie_id"] in added else "exists",
+        })
+    return [item for _, item in batch if item["movie_id"] in added]
+
+
+def import_rows(user_id: int, rows: Iterable) -> tuple[list[dict], list[dict]]:
+    """Validate and insert rows in batches as they are read, all in the
+    session's open transaction. The caller commits, or rolls back so a
+    failure midway leaves the library untouched.
+
+    Returns (per-row results, items that were newly added).
+    """
+    results, added = [], []
+    batch, batch_ids = [], set()
+
+    for row_number, row in enumerate(rows, start=1):
+        if row_number > MAX_ITEMS:
+            results.append({"row": row_number, "status": "invalid", "error": f"Import is limited to {MAX_ITEMS} items"})
+            break
+        try:
+            item = normalize_row(row)
+        except ValueError as e:
+            results.append({"row": row_number, "status": "invalid", "error": str(e)})
+            continue
+
+        # Postgres rejects a statement that conflicts with itself, so
+        # repeats within a batch are resolved here
+        if item["movie_id"] in batch_ids:
+            results.append({"row": row_number, "movie_id": item["movie_id"], "status": "exists"})
+            continue
+        batch.append((row_number, item))
+        batch_ids.add(item["movie_id"])
+
+        if len(batch) >= BATCH_SIZE:
+            added += _insert_batch(user_id, batch, results)
+            batch, batch_ids = [], set()
+
+    if batch:
+        added += _insert_batch(user_id, batch, results)
+
+    results.sort(key=lambda r: r["row"])
+    return results, added
+
+
+def export_rows(user_id: int) -> Iterator:
+    """Stream the user's library rows, oldest first, without loading them all."""
+    query = (db.select(*(getattr(LibraryItem, f) for f in EXPORT_FIELDS))
+             .where(LibraryItem.user_id == user_id)
+             .order_by(LibraryItem.created_at, LibraryItem.id)
+             .execution_options(yield_per=1000))
+    yield from db.session.execute(query)
@@ -0,0 +1,285 @@
+import logging
+import threading
+import time
+
+import numpy as np
+from flask import current_app
+from scipy import sparse
+
+from app import db
+from config import Config
+from models.library_item import LibraryItem
+
+logger = logging.getLogger(__name__)
+
+
+class CooccurrenceRecommender:
+    """Item-item collaborative filtering over the library_items table.
+
+    Keeps a sparse movie x movie co-occurrence matrix C = X^T X, where X is
+    the binary user x movie matrix. Library adds/removes queue their
+    changes to C (O(items in that user's library) each) and the queue is
+    folded into C once, the next time recommendations are scored. A full
+    rebuild runs on a background thread every RECS_LOCAL_REFRESH_SECONDS,
+    so each process also picks up changes made by other workers; the old
+    model keeps serving meanwhile. Only each user's most recent
+    RECS_LOCAL_MAX_ITEMS_PER_USER items count, so a user contributes at
+    most cap^2 entries to C.
+    """
+
+    STRATEGIES = ("average", "least_misery", "most_pleasure")
+
+    def __init__(self, max_items_per_user: int, refresh_seconds: int):
+        self.max_items_per_user = max_items_per_user
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._movie_index = {}   # TMDB id -> matrix column
+        self._movie_ids = []     # matrix column -> TMDB id
+        self._user_items = {}    # user id -> set of TMDB ids that count toward C
+        self._meta = {}          # TMDB id -> display fields from library_items
+        self._cooc = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._pending = ([], [], [])  # queued (row, col, value) changes to C
+        self._sim = None         # cosine-normalized C, rebuilt lazily
+        self._stale = False
+        self._refresh_lock = threading.Lock()
+
+    # === BUILD ===
+
+    def refresh(self) -> None:
+        """Rebuild the model from scratch. Needs an app context.
+
+        Adds/removes recorded while the rebuild runs are only picked up by
+        the next one.
+        """
+        rows = db.session.execute(
+            db.select(
+                LibraryItem.user_id,
+                LibraryItem.movie_id,
+                LibraryItem.title,
+                LibraryItem.poster_path,
+                LibraryItem.release_date,
+                LibraryItem.vote_average,
+            ).order_by(LibraryItem.user_id, LibraryItem.created_at.desc(), LibraryItem.id.desc())
+        )
+
+        movie_index, movie_ids, user_items, meta = {}, [], {}, {}
+        user_rows, movie_cols = [], []
+        user_pos = {}
+        for user_id, movie_id, title, poster_path, release_date, vote_average in rows:
+            meta.setdefault(movie_id, {
+                "title": title,
+                "poster_path": poster_path,
+                "release_date": release_date,
+                "vote_average": vote_average,
+            })
+            items = user_items.setdefault(user_id, set())
+            if len(items) >= self.max_items_per_user:
+                continue
+            items.add(movie_id)
+            if movie_id not in movie_index:
+                movie_index[movie_id] = len(movie_ids)
+                movie_ids.append(movie_id)
+            user_rows.append(user_pos.setdefault(user_id, len(user_pos)))
+            movie_cols.append(movie_index[movie_id])
+
+        X = sparse.csr_matrix(
+            (np.ones(len(user_rows), dtype=np.float32), (user_rows, movie_cols)),
+            shape=(len(user_pos), len(movie_ids)),
+        )
+        cooc = (X.T @ X).tocsr()
+
+        with self._lock:
+            self._movie_index = movie_index
+            self._movie_ids = movie_ids
+            self._user_items = user_items
+            self._meta = meta
+            self._cooc = cooc
+            self._pending = ([], [], [])
+            self._sim = None
+            self._stale = False
+            self._built_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Rebuild on next use, e.g. after a bulk import."""
+        with self._lock:
+            self._stale = True
+
+    def _ensure_fresh(self) -> None:
+        if self._built_at is None:
+            # First use: nothing to serve yet, so build inline. The lock
+            # makes concurrent first requests share one build.
+            with self._refresh_lock:
+                if self._built_at is None:
+                    self.refresh()
+            return
+
+        if self._stale or time.monotonic() - self._built_at > self.refresh_seconds:
+            if self._refresh_lock.acquire(blocking=False):
+                threading.Thread(
+                    target=self._background_refresh,
+                    args=(current_app._get_current_object(),),
+                    name="local-recs-refresh",
+                    daemon=True,
+                ).start()
+
+    def _background_refresh(self, app) -> None:
+        # Runs with _refresh_lock held; the caller acquired it
+        try:
+            with app.app_context():
+                self.refresh()
+        except Exception as e:
+            logger.warning("Local recommender refresh failed: %s", e)
+        finally:
+            self._refresh_lock.release()
+
+    # === INCREMENTAL UPDATES ===
+
+    def _apply(self, user_id: int, movie_id: int, sign: float) -> None:
+        # Caller holds the lock
+        items = self._user_items.setdefault(user_id, set())
+        others = [self._movie_index[m] for m in items if m != movie_id]
+        col = self._movie_index[movie_id]
+
+        rows, cols, values = self._pending
+        rows += [col] * len(others) + others + [col]
+        cols += others + [col] * len(others) + [col]
+        values += [sign] * (2 * len(others) + 1)
+        self._sim = None
+
+    def _fold_pending(self) -> None:
+        # Caller holds the lock. One O(nnz) merge for every queued change.
+        rows, cols, values = self._pending
+        if not rows:
+            return
+        n = len(self._movie_ids)
+        cooc = self._cooc
+        if cooc.shape != (n, n):
+            cooc = cooc.copy()
+            cooc.resize((n, n))
+        delta = sparse.csr_matrix((np.array(values, dtype=np.float32), (rows, cols)), shape=(n, n))
+        self._cooc = (cooc + delta).tocsr()
+        self._cooc.eliminate_zeros()
+        self._pending = ([], [], [])
+
+    def record_add(self, user_id: int, movie: dict) -> None:
+        """Fold a library add into the model without a rebuild."""
+        movie_id = movie["id"]
+        with self._lock:
+            if self._built_at is None:
+                return
+            items = self._user_items.setdefault(user_id, set())
+            if movie_id in items or len(items) >= self.max_items_per_user:
+                return
+
+            self._meta.setdefault(movie_id, {
+                "title": movie.get("title"),
+                "poster_path": movie.get("poster_path"),
+                "release_date": movie.get("release_date"),
+                "vote_average": movie.get("vote_average"),
+            })
+            if movie_id not in self._movie_index:
+                # C grows to match when the queue is folded
+                self._movie_index[movie_id] = len(self._movie_ids)
+                self._movie_ids.append(movie_id)
+
+            items.add(movie_id)
+            self._apply(user_id, movie_id, 1.0)
+
+    def record_remove(self, user_id: int, movie_id: int) -> None:
+        with self._lock:
+            items = self._user_items.get(user_id)
+            if self._built_at is None or not items or movie_id not in items:
+                return
+            self._apply(user_id, movie_id, -1.0)
+            items.discard(movie_id)
+
+    # === SCORING ===
+
+    def _similarity(self) -> sparse.csr_matrix:
+        # Caller holds the lock
+        if self._sim is None:
+            self._fold_pending()
+            counts = self._cooc.diagonal()
+            inv = np.zeros_like(counts)
+            np.divide(1.0, np.sqrt(counts), out=inv, where=counts > 0)
+            scale = sparse.diags(inv)
+            sim = (scale @ self._cooc @ scale).tocsr()
+            sim.setdiag(0)
+            sim.eliminate_zeros()
+            self._sim = sim
+        return self._sim
+
+    def recommend(self, user_ids: list[int], n: int = 10, strategy: str = "average") -> list[dict]:
+        """Top-n movies for a group, aggregated across members.
+
+        Each member's score for a movie is the mean cosine similarity to
+        the movies in their library. "average" takes the mean over members,
+        "least_misery" the minimum, "most_pleasure" the maximum. Movies
+        already in any member's library are never returned.
+        """
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+
+        self._ensure_fresh()
+        with self._lock:
+            sim = self._similarity()
+            movie_index, movie_ids, meta = self._movie_index, list(self._movie_ids), self._meta
+            libraries = [set(self._user_items.get(uid) or ()) for uid in set(user_ids)]
+
+        libraries = [lib for lib in libraries if lib]
+        if not libraries or sim.shape[0] == 0:
+            return []
+
+        member_scores = []
+        for lib in libraries:
+            cols = [movie_index[m] for m in lib if m in movie_index]
+            member_scores.append(np.asarray(sim[cols].sum(axis=0)).ravel() / len(cols))
+        scores = np.vstack(member_scores)
+
+        if strategy == "least_misery":
+            group = scores.min(axis=0)
+        elif strategy == "most_pleasure":
+            group = scores.max(axis=0)
+        else:
+            group = scores.mean(axis=0)
+
+        owned = [movie_index[m] for lib in libraries for m in lib if m in movie_index]
+        group[owned] = 0
+        candidates = np.flatnonzero(group > 0)
+        if candidates.size == 0:
+            return []
+        top = candidates[np.argsort(-group[candidates], kind="stable")[:n]]
+
+        owned_cols = np.array(sorted(set(owned)))
+        recs = []
+        for col in top:
+            movie_id = movie_ids[col]
+            info = meta.get(movie_id, {})
+            # Explain with the group's movies most similar to this one
+            related = sim[owned_cols, col].toarray().ravel()
+            because = [
+                meta.get(movie_ids[owned_cols[i]], {}).get("title")
+                for i in np.argsort(-related)[:2]
+                if related[i] > 0
+            ]
+            recs.append({
+                "movie_id": movie_id,
+                "title": info.get("title"),
+                "year": (info.get("release_date") or "")[:4] or None,
+                "poster_path": info.get("poster_path"),
+                "release_date": info.get("release_date"),
+                "vote_average": info.get("vote_average"),
+                "score": round(float(group[col]), 4),
+                "why": (
+                    f"Often saved alongside {' and '.join(t for t in because if t)}."
+                    if any(because) else "Popular with people who share your group's taste."
+                ),
+            })
+        return recs
+
+
+engine = CooccurrenceRecommender(
+    max_items_per_user=Config.RECS_LOCAL_MAX_ITEMS_PER_USER,
+    refresh_seconds=Config.RECS_LOCAL_REFRESH_SECONDS,
+)
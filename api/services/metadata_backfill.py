@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+
+from requests import HTTPError
+
+from app import db
+from config import Config
+from models.backfill_checkpoint import BackfillCheckpoint
+from services import tmdb
+from services.cache_warmer import Pacer, retry_after_seconds
+from services.leases import acquire_lease
+from services.movie_documents import store_movie_details
+from services.movie_metadata import missing_library_movie_ids
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = "movie_metadata"
+LEASE = "metadata-backfill"
+
+
+def _checkpoint() -> BackfillCheckpoint:
+    checkpoint = db.session.get(BackfillCheckpoint, CHECKPOINT)
+    if checkpoint is None:
+        checkpoint = BackfillCheckpoint(name=CHECKPOINT, last_key=0, processed=0, failed=0)
+        db.session.add(checkpoint)
+        db.session.commit()
+    return checkpoint
+
+
+def _fetch(movie_id: int, pacer: Pacer) -> None:
+    for attempt in range(2):
+        try:
+            store_movie_details(tmdb.get_movie_details(movie_id))
+            pacer.recovered()
+            return
+        except HTTPError as e:
+            if e.response is not None and e.response.status_code == 429 and attempt == 0:
+                pacer.throttled(retry_after_seconds(e))
+                continue
+            raise
+
+
+def backfill_movie_metadata(
+    batch_size: int | None = None,
+    rate: float | None = None,
+    max_batches: int | None = None,
+    report=logger.info,
+) -> dict:
+    """Fetch TMDB details for library movies missing from the movies table.
+
+    Works through movie ids in ascending order, committing a checkpoint
+    after every batch so an interrupted run resumes where it stopped.
+    Movies that fail are skipped until the next full pass, which starts
+    once the end is reached. Needs an app context.
+    """
+    batch_size = batch_size or Config.METADATA_BACKFILL_BATCH_SIZE
+    pacer = Pacer(Config.METADATA_BACKFILL_RATE if rate is None else rate)
+    checkpoint = _checkpoint()
+    run = {"processed": 0, "failed": 0, "batches": 0, "resumed_from": checkpoint.last_key}
+
+    tmdb.set_pacer(pacer)
+    try:
+        while max_batches is None or run["batches"] < max_batches:
+            movie_ids = missing_library_movie_ids(checkpoint.last_key, batch_size)
+            if not movie_ids:
+                # Pass complete; the next one retries earlier failures
+                checkpoint.last_key = 0
+                db.session.commit()
+                run["complete"] = True
+                break
+
+            failed = 0
+            for movie_id in movie_ids:
+                try:
+                    _fetch(movie_id, pacer)
+                except Exception as e:
+                    db.session.rollback()
+                    failed += 1
+                    logger.warning("Metadata backfill for movie %s failed: %s", movie_id, e)
+
+            checkpoint.last_key = movie_ids[-1]
+            checkpoint.processed += len(movie_ids) - failed
+            checkpoint.failed += failed
+            db.session.commit()
+
+            run["batches"] += 1
+            run["processed"] += len(movie_ids) - failed
+            run["failed"] += failed
+            report(
+                f"[metadata] batch {run['batches']}: through movie {checkpoint.last_key}, "
+                f"{run['processed']} stored, {run['failed']} failed"
+            )
+    finally:
+        tmdb.set_pacer(None)
+
+    run.setdefault("complete", False)
+    return run
+
+
+def start_metadata_backfill(app) -> threading.Thread:
+    """Run the backfill on a daemon thread every METADATA_BACKFILL_INTERVAL
+    seconds, in whichever worker holds the "metadata-backfill" lease.
+    """
+    interval = Config.METADATA_BACKFILL_INTERVAL
+    lease = Config.BACKGROUND_LEASE_SECONDS
+
+    def loop():
+        while True:
+            with app.app_context():
+                try:
+                    if acquire_lease(LEASE, lease):
+                        summary = backfill_movie_metadata()
+                        if summary["processed"] or summary["failed"]:
+                            logger.info("Metadata backfill finished: %s", summary)
+                        acquire_lease(LEASE, interval + lease)
+                except Exception as e:
+                    logger.exception("Metadata backfill failed: %s", e)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="metadata-backfill", daemon=True)
+    thread.start()
+    return thread
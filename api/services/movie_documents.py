@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from config import Config
+from models.movie_document import MovieDocument
+from services.movie_metadata import upsert_movies
+from services.resolution_index import index_movies
+from services.search_index import FIELDS as SUMMARY_FIELDS
+from services.tmdb import get_movie_details
+from services.upsert import insert_for
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ("videos", "cast", "crew")
+CAST_LIMIT = 15
+CREW_LIMIT = 20
+
+# Key crew first; the rest of the (often several hundred long) list is cut
+_CREW_PRIORITY = {
+    "Director": 0,
+    "Screenplay": 1,
+    "Writer": 1,
+    "Novel": 2,
+    "Story": 2,
+    "Producer": 3,
+    "Original Music Composer": 4,
+    "Director of Photography": 5,
+    "Editor": 6,
+}
+
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="movie-docs")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def map_movie_details(m: dict) -> dict:
+    """Map a TMDB details payload to the frontend shape."""
+    credits = m.get("credits", {}) or {}
+    crew = sorted(credits.get("crew", []), key=lambda c: _CREW_PRIORITY.get(c.get("job"), 99))
+    return {
+        "id": m.get("id"),
+        "title": m.get("title"),
+        "tagline": m.get("tagline"),
+        "overview": m.get("overview"),
+        "poster_url": m.get("poster_path"),
+        "backdrop_url": m.get("backdrop_path"),
+        "release_date": m.get("release_date"),
+        "vote_average": m.get("vote_average"),
+        "runtime": m.get("runtime"),
+        "genres": [g.get("name") for g in m.get("genres", []) if g.get("name")],
+        "homepage": m.get("homepage"),
+        "videos": [
+            {
+                "id": v.get("id"),
+                "key": v.get("key"),
+                "name": v.get("name"),
+                "site": v.get("site"),
+                "type": v.get("type"),
+            }
+            for v in (m.get("videos", {}) or {}).get("results", [])
+        ],
+        "cast": [
+            {
+                "id": c.get("id"),
+                "name": c.get("name"),
+                "character": c.get("character"),
+                "profile_path": c.get("profile_path"),
+            }
+            for c in credits.get("cast", [])[:CAST_LIMIT]
+        ],
+        "crew": [
+            {
+                "id": c.get("id"),
+                "name": c.get("name"),
+                "job": c.get("job"),
+            }
+            for c in crew[:CREW_LIMIT]
+        ],
+    }
+
+
+def store_movie_details(details: dict) -> MovieDocument:
+    """Map, serialize, compress and upsert a TMDB details payload."""
+    body = json.dumps(map_movie_details(details), separators=(",", ":")).encode()
+    values = {
+        "movie_id": details["id"],
+        "document": zlib.compress(body),
+        "etag": hashlib.sha256(body).hexdigest(),
+        "fetched_at": datetime.now(),
+    }
+    stmt = insert_for(MovieDocument).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["movie_id"],
+        set_={k: stmt.excluded[k] for k in ("document", "etag", "fetched_at")},
+    )
+    db.session.execute(stmt)
+    db.session.commit()
+
+    # Makes movies only ever opened by id findable by local search
+    index_movies([{key: details.get(key) for key in SUMMARY_FIELDS}], overwrite=False)
+    upsert_movies([details])
+    return MovieDocument(**values)
+
+
+def _refresh(app, movie_id: int) -> None:
+    try:
+        with app.app_context():
+            store_movie_details(get_movie_details(movie_id))
+    except Exception as e:
+        logger.warning("Failed to refresh movie document %s: %s", movie_id, e)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(movie_id)
+
+
+def _schedule_refresh(movie_id: int) -> None:
+    with _refreshing_lock:
+        if movie_id in _refreshing:
+            return
+        _refreshing.add(movie_id)
+    _refresh_pool.submit(_refresh, current_app._get_current_object(), movie_id)
+
+
+def prefetch_movie(movie_id: int) -> None:
+    """Fetch and store a movie's TMDB details in the background unless a
+    document already exists. Storing also indexes it from TMDB's payload.
+    """
+    stored = db.session.execute(
+        db.select(MovieDocument.movie_id).where(MovieDocument.movie_id == movie_id)
+    ).first()
+    if stored is None:
+        _schedule_refresh(movie_id)
+
+
+def get_movie_document(movie_id: int) -> MovieDocument:
+    """Load the stored document, fetching it from TMDB on first use.
+
+    Stale documents are still served; a background refresh replaces them.
+    """
+    doc = db.session.get(MovieDocument, movie_id)
+    if doc is None:
+        return store_movie_details(get_movie_details(movie_id))
+
+    if doc.fetched_at < datetime.now() - timedelta(seconds=Config.MOVIE_DOC_TTL):
+        _schedule_refresh(movie_id)
+    return doc
+
+
+def document_etag(doc: MovieDocument, sections: tuple[str, ...]) -> str:
+    if sections == SECTIONS:
+        return doc.etag
+    return f"{doc.etag[:48]}-{'.'.join(sections) or 'core'}"
+
+
+def render_document(doc: MovieDocument, sections: tuple[str, ...]) -> bytes:
+    """Serialized response body containing only the requested sections."""
+    body = zlib.decompress(doc.document)
+    if sections == SECTIONS:
+        return body
+
+    data = json.loads(body)
+    for section in SECTIONS:
+        if section not in sections:
+            data.pop(section, None)
+    return json.dumps(data, separators=(",", ":")).encode()
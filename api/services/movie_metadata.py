@@ -0,0 +1,61 @@
+import logging
+from datetime import datetime
+
+from app import db
+from models.library_item import LibraryItem
+from models.movie import Movie
+from services.upsert import insert_for
+
+logger = logging.getLogger(__name__)
+
+UPDATED_FIELDS = ("title", "release_date", "genres", "runtime", "popularity", "vote_average", "original_language")
+
+
+def _row(details: dict) -> dict:
+    return {
+        "movie_id": details["id"],
+        "title": (details.get("title") or "")[:255],
+        "release_date": (details.get("release_date") or "")[:10] or None,
+        "genres": [g.get("name") for g in details.get("genres") or [] if g.get("name")],
+        "runtime": details.get("runtime"),
+        "popularity": details.get("popularity"),
+        "vote_average": details.get("vote_average"),
+        "original_language": details.get("original_language"),
+        "updated_at": datetime.now(),
+    }
+
+
+def upsert_movies(details_list: list[dict]) -> None:
+    """Write TMDB details payloads into the shared movies table.
+
+    Only details payloads carry genres and runtime; search results must
+    not be passed here. Failures are logged and swallowed.
+    """
+    rows = [_row(d) for d in details_list or [] if d.get("id") and d.get("title")]
+    if not rows:
+        return
+
+    try:
+        stmt = insert_for(Movie).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["movie_id"],
+            set_={k: stmt.excluded[k] for k in UPDATED_FIELDS + ("updated_at",)},
+        )
+        db.session.execute(stmt)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Failed to store movie metadata: %s", e)
+
+
+def missing_library_movie_ids(after: int, limit: int) -> list[int]:
+    """Library movie ids above `after` that have no metadata yet, ascending."""
+    rows = db.session.execute(
+        db.select(LibraryItem.movie_id)
+        .outerjoin(Movie, Movie.movie_id == LibraryItem.movie_id)
+        .where(LibraryItem.movie_id > after, Movie.movie_id.is_(None))
+        .group_by(LibraryItem.movie_id)
+        .order_by(LibraryItem.movie_id)
+        .limit(limit)
+    )
+    return [movie_id for (movie_id,) in rows]
@@ -1,33 +1,292 @@
-import os, json
+import os, json, re, logging, threading, hashlib, time
+from typing import Iterator
 from openai import OpenAI
 
+from config import Config
+from extensions.tracing import record, span, traced
+from services.resolution_index import normalize_title
+from services.singleflight import SingleFlight
+from services.token_bucket import acquire_upstream
+
+logger = logging.getLogger(__name__)
+
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 SYSTEM = (
     "You are a movie recommendation expert. "
-    "Given multiple users' liked movies (title, year), propose ~10 movies "
+    "Given multiple users' liked movies (title, year, genres), propose ~10 movies "
     "they will enjoy together. Avoid anything already liked. "
     "Return ONLY a JSON object with key 'recommendations', an array of "
     "items with {title, year, why}."
 )
 
-def generate_recommendations(group_library: list[dict]) -> dict:
+# Running totals across calls, for spotting where prompt cost comes from
+prompt_metrics = {
+    "calls": 0,
+    "estimated_prompt_tokens": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "movies_total": 0,
+    "movies_included": 0,
+}
+_metrics_lock = threading.Lock()
+
+# Identical prompts in flight at the same time share one completion
+flight = SingleFlight("openai")
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; close enough for budgeting
+    return (len(text) + 3) // 4
+
+
+def compact_group_library(group_library: dict, token_budget: int | None = None) -> tuple[str, dict]:
+    """Encode the output of join_user_libraries as a compact table.
+
+    Movies liked by several members are listed once with every member's
+    id. Shared movies come first, then each member's most recent
+    additions in round-robin order, until the token budget is spent.
+    Returns the prompt text and stats about what was kept.
+    """
+    if token_budget is None:
+        token_budget = Config.OPENAI_PROMPT_TOKEN_BUDGET
+
+    members = []
+    movies = {}
+    per_member = {}
+    for label, entry in enumerate((group_library or {}).values(), start=1):
+        members.append(f"{label}={entry.get('name') or 'Member ' + str(label)}")
+        keys = []
+        for item in entry.get("library") or []:
+            title = (item.get("name") or "").replace("|", "/").strip()
+            if not title:
+                continue
+            year = (item.get("date") or "")[:4]
+            key = item.get("movie_id") or (normalize_title(title), year)
+            movie = movies.setdefault(key, {
+                "title": title,
+                "year": year,
+                "genres": "/".join(item.get("genre") or []).replace("|", "/"),
+                "members": set(),
+                "added": "",
+            })
+            movie["members"].add(label)
+            movie["added"] = max(movie["added"], item.get("added") or "")
+            keys.append(key)
+        per_member[label] = sorted(keys, key=lambda k: movies[k]["added"], reverse=True)
+
+    shared = sorted(
+        (k for k, m in movies.items() if len(m["members"]) > 1),
+        key=lambda k: (len(movies[k]["members"]), movies[k]["added"]),
+        reverse=True,
+    )
+    order = list(shared)
+    seen = set(shared)
+    queues = [list(keys) for keys in per_member.values()]
+    while any(queues):
+        for keys in queues:
+            while keys:
+                key = keys.pop(0)
+                if key not in seen:
+                    seen.add(key)
+                    order.append(key)
+                    break
+
+    header = (
+        f"Members (id=name): {'; '.join(members)}\n"
+        "Liked movies (title|year|genres|member ids), shared first:\n"
+    )
+    tokens = estimate_tokens(header)
+    lines = []
+    for key in order:
+        movie = movies[key]
+        line = f"{movie['title']}|{movie['year']}|{movie['genres']}|{','.join(str(m) for m in sorted(movie['members']))}"
+        cost = estimate_tokens(line) + 1
+        if tokens + cost > token_budget:
+            continue
+        tokens += cost
+        lines.append(line)
+
+    stats = {
+        "members": len(members),
+        "movies_total": len(movies),
+        "movies_included": len(lines),
+        "shared_movies": len(shared),
+        "estimated_prompt_tokens": tokens,
+        "liked_titles": {normalize_title(m["title"]) for m in movies.values()},
+    }
+    return header + "\n".join(lines), stats
+
+
+def _build_messages(group_library) -> tuple[list[dict], dict]:
+    library_text, stats = compact_group_library(group_library)
     prompt = (
-        "Members' libraries:\n"
-        f"{json.dumps(group_library, ensure_ascii=False)}\n\n"
+        f"{library_text}\n\n"
         "Return only JSON with: { \"recommendations\": [{\"title\":\"...\",\"year\":YYYY,\"why\":\"...\"}] }"
     )
+    stats["estimated_prompt_tokens"] += estimate_tokens(SYSTEM) + estimate_tokens(prompt) - estimate_tokens(library_text)
+    messages = [
+        {"role": "system", "content": SYSTEM},
+        {"role": "user",   "content": prompt},
+    ]
+    return messages, stats
+
+
+def _record_usage(stats: dict, usage) -> None:
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
 
-    resp = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
-            {"role": "system", "content": SYSTEM},
-            {"role": "user",   "content": prompt},
-        ],
-        # JSON mode (the model must emit a single valid JSON object)
-        response_format={"type": "json_object"},
-        temperature=0.5,
+    with _metrics_lock:
+        prompt_metrics["calls"] += 1
+        prompt_metrics["estimated_prompt_tokens"] += stats["estimated_prompt_tokens"]
+        prompt_metrics["prompt_tokens"] += prompt_tokens
+        prompt_metrics["completion_tokens"] += completion_tokens
+        prompt_metrics["movies_total"] += stats["movies_total"]
+        prompt_metrics["movies_included"] += stats["movies_included"]
+
+    logger.info(
+        "openai recommendations: members=%d movies=%d/%d shared=%d "
+        "estimated_prompt_tokens=%d prompt_tokens=%d completion_tokens=%d",
+        stats["members"], stats["movies_included"], stats["movies_total"],
+        stats["shared_movies"], stats["estimated_prompt_tokens"],
+        prompt_tokens, completion_tokens,
     )
 
+
+def _not_already_liked(rec, stats: dict) -> bool:
+    # Libraries trimmed by the budget aren't in the prompt, so filter here
+    return not (isinstance(rec, dict) and normalize_title(rec.get("title") or "") in stats["liked_titles"])
+
+
+@traced("openai.recommendations")
+def generate_recommendations(group_library: list[dict]) -> dict:
+    messages, stats = _build_messages(group_library)
+    key = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()
+    return flight.do(key, _complete, messages, stats)
+
+
+def _complete(messages: list[dict], stats: dict) -> dict:
+    acquire_upstream("openai")
+    with span("openai.http"):
+        resp = client.chat.completions.create(
+            model=Config.OPENAI_MODEL,
+            messages=messages,
+            # JSON mode (the model must emit a single valid JSON object)
+            response_format={"type": "json_object"},
+            temperature=0.5,
+        )
+    _record_usage(stats, resp.usage)
+
     content = resp.choices[0].message.content
-    return json.loads(content)
+    recs = json.loads(content)
+    recs["recommendations"] = [
+        rec for rec in recs.get("recommendations") or [] if _not_already_liked(rec, stats)
+    ]
+    return recs
+
+
+class RecommendationStreamParser:
+    """Incrementally pulls complete items out of a streamed
+    { "recommendations": [ {...}, {...} ] } JSON document.
+
+    feed() returns the items whose closing brace arrived in that chunk.
+    """
+
+    _ARRAY_START = re.compile(r'"recommendations"\s*:\s*\[')
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = None
+
+    def feed(self, text: str) -> list[dict]:
+        self._buf += text
+        items = []
+
+        if not self._in_array:
+            match = self._ARRAY_START.search(self._buf)
+            if not match:
+                return items
+            self._in_array = True
+            self._pos = match.end()
+
+        while not self._done and self._pos < len(self._buf):
+            ch = self._buf[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = self._pos
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        items.append(json.loads(self._buf[self._start:self._pos + 1]))
+                    except json.JSONDecodeError:
+                        pass
+            elif ch == "]" and self._depth == 0:
+                self._done = True
+            self._pos += 1
+
+        return items
+
+
+def stream_recommendations(group_library) -> Iterator[dict]:
+    """Like generate_recommendations, but yields each recommendation as soon
+    as the model has finished writing it.
+
+    The rate limit token is taken before returning, so RateLimited reaches
+    the caller while it can still answer 429.
+    """
+    messages, stats = _build_messages(group_library)
+    acquire_upstream("openai")
+    return _stream(messages, stats)
+
+
+def _stream(messages: list[dict], stats: dict) -> Iterator[dict]:
+    started = time.perf_counter()
+    with span("openai.http"):
+        stream = client.chat.completions.create(
+            model=Config.OPENAI_MODEL,
+            messages=messages,
+            response_format={"type": "json_object"},
+            temperature=0.5,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+    parser = RecommendationStreamParser()
+    usage = None
+    first = True
+    try:
+        for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                for rec in parser.feed(delta):
+                    if _not_already_liked(rec, stats):
+                        if first:
+                            record("openai.stream_first_item", time.perf_counter() - started)
+                            first = False
+                        yield rec
+    finally:
+        # Closed early by the consumer: release the HTTP response
+        stream.close()
+    record("openai.stream", time.perf_counter() - started)
+    _record_usage(stats, usage)
@@ -0,0 +1,91 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+from config import Config
+
+# Loaded by spawned pool workers, so this module must not import the app.
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(Config.BCRYPT_MAX_PENDING)
+
+
+class HashingBusy(Exception):
+    """Too many hashes are queued, one timed out, or the pool died;
+    callers should answer 503.
+    """
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # Created on first use: keeps CLI commands and migrations from
+    # starting workers, and gives each server process its own pool
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.BCRYPT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _hash(password: bytes, rounds: int) -> str:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+
+def _check(password: bytes, password_hash: bytes) -> bool:
+    return bcrypt.checkpw(password, password_hash)
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn, *args):
+    if not _pending.acquire(blocking=False):
+        raise HashingBusy()
+    pool = _get_pool()
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        _pending.release()
+        _reset_pool(pool)
+        raise HashingBusy()
+    # Released when the work is done, not when we stop waiting: a timed-out
+    # hash still occupies the pool
+    future.add_done_callback(lambda _: _pending.release())
+
+    try:
+        return future.result(timeout=Config.BCRYPT_TIMEOUT)
+    except TimeoutError:
+        raise HashingBusy()
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM killed); the next call gets a fresh pool
+        _reset_pool(pool)
+        raise HashingBusy()
+
+
+def hash_password(password: str) -> str:
+    if not password:
+        raise ValueError("Password must be non-empty.")
+    return _run(_hash, password.encode("utf-8"), Config.BCRYPT_LOG_ROUNDS)
+
+
+def check_password(password: str, password_hash: str) -> bool:
+    return _run(_check, password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """True when the hash was made with a different cost factor than configured."""
+    try:
+        return int(password_hash.split("$")[2]) != Config.BCRYPT_LOG_ROUNDS
+    except (IndexError, ValueError):
+        return True
@@ -1,34 +1,371 @@
-from typing import List, Dict
+import hashlib
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, Dict
+from flask import current_app
+from app import db
+from config import Config
+from extensions.log import bind_request_id
+from extensions.tracing import traced
 from models.user import User
 from models.library_item import LibraryItem
+from models.movie import Movie
 
-from services.tmdb import search_movies
+from services.cache import make_cache
+from services.local_recommender import engine as local_engine
+from services.openai import generate_recommendations, stream_recommendations
+from services.resolution_index import get_indexed_movie, resolve_movie
 
-def join_user_libraries(user_ids: list[int]) -> Dict[str, List[LibraryItem]]:
+logger = logging.getLogger(__name__)
+
+# Shared pool for fanning out TMDB lookups of recommended titles
+_resolve_pool = ThreadPoolExecutor(
+    max_workers=Config.RECS_RESOLVE_WORKERS,
+    thread_name_prefix="recs-resolve",
+)
+
+recs_cache = make_cache(
+    Config.RECS_CACHE_BACKEND,
+    max_entries=Config.RECS_CACHE_MAX_ENTRIES,
+    path=Config.RECS_CACHE_PATH,
+)
+
+def _shared_movies(user_ids: list[int]):
+    members = db.func.count(db.distinct(LibraryItem.user_id))
+    return (
+        db.select(LibraryItem.movie_id, members.label("members"))
+        .where(LibraryItem.user_id.in_(user_ids))
+        .group_by(LibraryItem.movie_id)
+        .having(members > 1)
+    )
+
+
+@traced("recs.join_libraries")
+def join_user_libraries(user_ids: list[int], max_items_per_member: int | None = None) -> Dict[str, dict]:
+    """Each member's name and library, keyed by str(user id), newest first.
+    Genres come from the movies table, so no TMDB call is made here.
+
+    Only the needed columns are selected and rows are streamed. With
+    max_items_per_member, each member keeps at most that many items:
+    movies shared with other members first, then their most recent. Unknown
+    ids get an entry with no name and an empty library.
+    """
+    user_ids = list(dict.fromkeys(int(uid) for uid in user_ids or []))
     if not user_ids:
         return {}
     
     try:
-        users = User.query.filter(User.id.in_(user_ids)).all()
-        id_to_name = {u.id: u.display_name for u in users}
-
-        items = LibraryItem.query.filter(LibraryItem.user_id.in_(user_ids)).all()
-
+        names = dict(db.session.execute(
+            db.select(User.id, User.display_name).where(User.id.in_(user_ids))
+        ).all())
         group_lib = {
-            str(uid): {"name": id_to_name.get(uid), "library": []}
+            str(uid): {"name": names.get(uid), "library": []}
             for uid in user_ids
         }
 
-        for item in items:
-            group_lib[str(item.user_id)]["library"].append({
-                "name": item.title,
-                "date": item.release_date,
-                "genre": None # TODO
+        columns = (
+            LibraryItem.user_id,
+            LibraryItem.movie_id,
+            LibraryItem.title,
+            LibraryItem.release_date,
+            LibraryItem.created_at,
+        )
+        newest_first = (LibraryItem.created_at.desc(), LibraryItem.id.desc())
+        if max_items_per_member:
+            # Rank each member's shared movies (most members first) ahead of
+            # the rest, newest first, and keep the top of that list
+            shared = _shared_movies(user_ids).subquery()
+            rank = db.func.row_number().over(
+                partition_by=LibraryItem.user_id,
+                order_by=(db.func.coalesce(shared.c.members, 0).desc(), *newest_first),
+            )
+            ranked = (
+                db.select(*columns, LibraryItem.id, rank.label("rank"))
+                .outerjoin(shared, shared.c.movie_id == LibraryItem.movie_id)
+                .where(LibraryItem.user_id.in_(user_ids))
+                .subquery()
+            )
+            query = (
+                db.select(*(ranked.c[c.key] for c in columns), Movie.genres)
+                .outerjoin(Movie, Movie.movie_id == ranked.c.movie_id)
+                .where(ranked.c.rank <= max_items_per_member)
+                .order_by(ranked.c.user_id, ranked.c.created_at.desc(), ranked.c.id.desc())
+            )
+        else:
+            query = (
+                db.select(*columns, Movie.genres)
+                .outerjoin(Movie, Movie.movie_id == LibraryItem.movie_id)
+                .where(LibraryItem.user_id.in_(user_ids))
+                .order_by(LibraryItem.user_id, *newest_first)
+            )
+
+        rows = db.session.execute(query.execution_options(yield_per=1000))
+        for user_id, movie_id, title, release_date, created_at, genres in rows:
+            group_lib[str(user_id)]["library"].append({
+                "movie_id": movie_id,
+                "name": title,
+                "date": release_date,
+                "added": created_at.isoformat() if created_at else None,
+                # From the shared movies table; None until the backfill reaches it
+                "genre": genres or None,
             })
 
         return group_lib
-    except Exception as e:
-        print(f"Exception in join_user_libraries: {e}")
-        import traceback
-        traceback.print_exc()
-        raise
\ No newline at end of file
+    except Exception:
+        logger.exception("join_user_libraries failed for users %s", user_ids)
+        raise
+
+
+# === BACKENDS ===
+# Each backend takes the group's user ids and returns an iterable of
+# recommendation dicts ({title, year, why}, optionally movie_id), or None
+# when it has nothing useful to say for this group.
+
+def _llm_backend(user_ids: list[int], stream: bool = False):
+    group_lib = join_user_libraries(user_ids, max_items_per_member=Config.RECS_MAX_ITEMS_PER_MEMBER)
+    if stream:
+        return stream_recommendations(group_lib)
+    return generate_recommendations(group_lib).get("recommendations") or []
+
+
+@traced("recs.local")
+def _local_backend(user_ids: list[int], stream: bool = False):
+    recs = local_engine.recommend(user_ids, n=Config.RECS_COUNT, strategy=Config.RECS_LOCAL_STRATEGY)
+    # Too little co-occurrence data for this group: let the caller fall back
+    return recs if len(recs) >= Config.RECS_LOCAL_MIN_RESULTS else None
+
+
+RECOMMENDATION_BACKENDS = {
+    "local": _local_backend,
+    "llm": _llm_backend,
+}
+
+
+@traced("recs.generate")
+def generate_group_recommendations(
+    user_ids: list[int],
+    backend: str | None = None,
+    stream: bool = False,
+    fingerprint: str | None = None,
+) -> tuple[str, list[dict] | None, Iterable[dict] | None]:
+    """Recommendations for a group from the selected backend.
+
+    The local engine is tried first unless the LLM is explicitly selected;
+    the LLM is used as the cold-start fallback. With stream=True the LLM
+    result is a live iterator.
+
+    Returns (backend that answered, cached results, recs); exactly one of
+    the last two is set. Results must be cached under the answering
+    backend, so a fallback answer isn't served to local requests once the
+    local engine can handle the group. With `fingerprint` given, a cached
+    LLM answer for the group is reused instead of calling the LLM again.
+    """
+    backend = backend or Config.RECS_BACKEND
+    if backend not in RECOMMENDATION_BACKENDS:
+        raise ValueError(f"Unknown recommendation backend: {backend}")
+
+    recs = RECOMMENDATION_BACKENDS[backend](user_ids, stream=stream)
+    if recs is not None:
+        return backend, None, recs
+
+    if fingerprint is not None:
+        cached = get_cached_recommendations(f"llm:{fingerprint}")
+        if cached is not None:
+            return "llm", cached, None
+    return "llm", None, _llm_backend(user_ids, stream=stream)
+
+
+def _parse_year(value) -> int | None:
+    try:
+        return int(str(value)[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+@traced("recs.resolve_one")
+def _resolve_one(app, rec: dict) -> dict | None:
+    # Runs on a pool thread, so it needs its own app context for DB access
+    with app.app_context():
+        if rec.get("movie_id"):
+            # Local-engine recs already carry the TMDB id; no search needed
+            m = get_indexed_movie(rec["movie_id"]) or {"id": rec["movie_id"], **rec}
+        else:
+            m = resolve_movie(rec["title"], _parse_year(rec.get("year")))
+    if m is None:
+        return None
+
+    return {
+        "id": m.get("id"),
+        "title": m.get("title"),
+        "overview": m.get("overview"),
+        "poster_url": f"{m['poster_path']}" if m.get("poster_path") else None,
+        "release_date": m.get("release_date"),
+        "vote_average": m.get("vote_average"),
+        "why": rec.get("why"),
+    }
+
+
+@traced("recs.resolve")
+def resolve_recommendations(recs: list[dict], timeout: float | None = None, report: dict | None = None) -> list[dict]:
+    """Match LLM recommendations to TMDB movies concurrently.
+
+    Each title is resolved through the local resolution index first, so
+    repeat titles cost no network call.
+
+    Results keep the order of `recs`. Items whose lookup fails, finds
+    nothing, or does not finish within `timeout` seconds are dropped
+    instead of failing the whole batch. Lookups that failed or timed out
+    are counted in report["failed"], so callers can avoid caching a
+    degraded result.
+    """
+    if timeout is None:
+        timeout = Config.RECS_RESOLVE_TIMEOUT
+    report = {} if report is None else report
+    report["failed"] = 0
+
+    app = current_app._get_current_object()
+    resolve = bind_request_id(_resolve_one)
+    futures = [
+        _resolve_pool.submit(resolve, app, rec)
+        for rec in recs
+        if isinstance(rec, dict) and rec.get("title")
+    ]
+    wait(futures, timeout=timeout)
+
+    results = []
+    for future in futures:
+        movie = _future_result(future, report)
+        if movie is not None:
+            results.append(movie)
+    return results
+
+
+def resolve_stream(recs: Iterable[dict], timeout: float | None = None, report: dict | None = None) -> Iterator[tuple[int, dict]]:
+    """Streaming counterpart of resolve_recommendations.
+
+    `recs` (typically a live LLM stream) is consumed on a background
+    thread and each lookup starts as soon as its rec arrives. (index,
+    movie) pairs are yielded in completion order, so callers must use the
+    index to restore order. Once `recs` is exhausted, stragglers get
+    `timeout` seconds to finish. Errors raised by `recs` are re-raised.
+    Failed and timed-out lookups are counted in report["failed"].
+
+    Closing the generator early (e.g. the client disconnected) stops
+    reading `recs` and cancels lookups that haven't started.
+    """
+    if timeout is None:
+        timeout = Config.RECS_RESOLVE_TIMEOUT
+    report = {} if report is None else report
+    report["failed"] = 0
+
+    app = current_app._get_current_object()
+    resolve = bind_request_id(_resolve_one)
+    events = queue.Queue()
+    stop = threading.Event()
+    futures = []
+
+    def produce():
+        count = 0
+        try:
+            for rec in recs:
+                if stop.is_set():
+                    break
+                if not (isinstance(rec, dict) and rec.get("title")):
+                    continue
+                future = _resolve_pool.submit(resolve, app, rec)
+                futures.append(future)
+                future.add_done_callback(lambda f, i=count: events.put(("item", i, f)))
+                count += 1
+        except Exception as e:
+            events.put(("error", None, e))
+        finally:
+            if stop.is_set() and hasattr(recs, "close"):
+                # Ends the upstream LLM stream instead of reading it to the end
+                recs.close()
+        events.put(("end", count, None))
+
+    threading.Thread(target=bind_request_id(produce), name="recs-stream", daemon=True).start()
+
+    expected, received, deadline = None, 0, None
+    try:
+        while expected is None or received < expected:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                kind, index, payload = events.get(timeout=remaining)
+            except queue.Empty:
+                report["failed"] += expected - received
+                return
+            if kind == "error":
+                raise payload
+            if kind == "end":
+                expected, deadline = index, time.monotonic() + timeout
+                continue
+
+            received += 1
+            movie = _future_result(payload, report)
+            if movie is not None:
+                yield index, movie
+    finally:
+        stop.set()
+        for future in list(futures):
+            future.cancel()
+
+
+def _future_result(future, report: dict) -> dict | None:
+    if not future.done():
+        future.cancel()
+        report["failed"] += 1
+        return None
+    if future.exception() is not None:
+        logger.warning("Failed to resolve recommendation: %s", future.exception())
+        report["failed"] += 1
+        return None
+    return future.result()
+
+
+@traced("recs.fingerprint")
+def group_fingerprint(user_ids: list[int]) -> str:
+    """Stable key for a group: sorted member ids plus a hash of each
+    member's library movie ids. Any library change yields a new key.
+    """
+    ids = sorted(set(user_ids))
+    rows = (
+        db.session.query(LibraryItem.user_id, LibraryItem.movie_id)
+        .filter(LibraryItem.user_id.in_(ids))
+        .order_by(LibraryItem.user_id, LibraryItem.movie_id)
+    )
+
+    libraries = {uid: hashlib.sha1() for uid in ids}
+    for user_id, movie_id in rows:
+        libraries[user_id].update(f"{movie_id},".encode())
+
+    group = hashlib.sha256()
+    for uid in ids:
+        group.update(f"{uid}:{libraries[uid].hexdigest()};".encode())
+    return group.hexdigest()
+
+
+def get_cached_recommendations(fingerprint: str) -> list[dict] | None:
+    return recs_cache.get(f"recs:group:{fingerprint}")
+
+
+def cache_recommendations(fingerprint: str, user_ids: list[int], results: list[dict]) -> None:
+    recs_cache.set(f"recs:group:{fingerprint}", results, Config.RECS_CACHE_TTL)
+
+    # Remember which entries each member appears in so library changes can purge them
+    for uid in set(user_ids):
+        key = f"recs:user:{uid}"
+        fingerprints = recs_cache.get(key) or []
+        if fingerprint not in fingerprints:
+            recs_cache.set(key, fingerprints + [fingerprint], Config.RECS_CACHE_TTL)
+
+
+def invalidate_user_recommendations(user_id: int) -> None:
+    """Drop every cached group result that includes `user_id`."""
+    key = f"recs:user:{user_id}"
+    for fingerprint in recs_cache.get(key) or []:
+        recs_cache.delete(f"recs:group:{fingerprint}")
+    recs_cache.delete(key)
@@ -0,0 +1,152 @@
+import logging
+import math
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+from app import db
+from models.movie_resolution import MovieResolution
+from services.cache import MemoryCache
+from services.tmdb import search_movies
+from services.upsert import insert_for
+
+logger = logging.getLogger(__name__)
+
+# Movies written to the index recently by this process; skips rewriting the
+# same rows on every keystroke of a search.
+_recently_indexed = MemoryCache(max_entries=20000)
+RECENT_TTL = 3600
+
+MIN_SCORE = 0.5
+BATCH_SIZE = 500
+
+
+def normalize_title(title: str) -> str:
+    """Casefold, strip accents and punctuation, collapse whitespace."""
+    title = unicodedata.normalize("NFKD", title or "")
+    title = "".join(ch for ch in title if not unicodedata.combining(ch))
+    title = title.casefold().replace("&", " and ")
+    title = re.sub(r"[^\w\s]", " ", title)
+    return " ".join(title.split())
+
+
+def release_year(release_date: str | None) -> int | None:
+    if release_date and len(release_date) >= 4 and release_date[:4].isdigit():
+        return int(release_date[:4])
+    return None
+
+
+def _row(movie: dict) -> dict:
+    return {
+        "movie_id": movie["id"],
+        "normalized_title": normalize_title(movie["title"])[:255],
+        "year": release_year(movie.get("release_date")),
+        "popularity": movie.get("popularity"),
+        "payload": movie,
+    }
+
+
+def index_movies(movies: list[dict], overwrite: bool = True) -> None:
+    """Upsert TMDB movie payloads into the resolution index.
+
+    With overwrite=False existing rows are kept, which is what partial
+    payloads (e.g. library adds) want so they don't clobber full search
+    results. Failures are logged and swallowed; indexing is best effort.
+    """
+    rows = {}
+    for m in movies or []:
+        if not (m.get("id") and m.get("title")):
+            continue
+        if overwrite and _recently_indexed.get(m["id"]) is not None:
+            continue
+        rows[m["id"]] = _row(m)
+    rows = list(rows.values())
+    if not rows:
+        return
+
+    try:
+        # Chunked to stay under SQLite's bound-parameter limit on big imports
+        for start in range(0, len(rows), BATCH_SIZE):
+            stmt = insert_for(MovieResolution).values(rows[start:start + BATCH_SIZE])
+            if overwrite:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["movie_id"],
+                    set_={
+                        "normalized_title": stmt.excluded.normalized_title,
+                        "year": stmt.excluded.year,
+                        "popularity": stmt.excluded.popularity,
+                        "payload": stmt.excluded.payload,
+                        "updated_at": db.func.now(),
+                    },
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=["movie_id"])
+            db.session.execute(stmt)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Failed to index movies: %s", e)
+        return
+
+    for row in rows:
+        _recently_indexed.set(row["movie_id"], True, RECENT_TTL)
+
+    # Imported here: the search index builds on normalize_title from this module
+    from services.search_index import search_index
+    search_index.add_movies([row["payload"] for row in rows], overwrite=overwrite)
+
+
+def score_match(title: str, year: int | None, movie: dict) -> float:
+    """Score how well a TMDB movie matches a title/year pair (higher is better)."""
+    wanted = normalize_title(title)
+    score = max(
+        SequenceMatcher(None, wanted, normalize_title(movie.get(key) or "")).ratio()
+        for key in ("title", "original_title")
+    )
+
+    movie_year = release_year(movie.get("release_date"))
+    if year and movie_year:
+        gap = abs(year - movie_year)
+        # Release dates differ by region, so an off-by-one year still counts
+        score += 0.3 if gap == 0 else 0.15 if gap == 1 else -0.2
+
+    # Small popularity nudge to break ties between remakes and obscure titles
+    score += min(math.log1p(movie.get("popularity") or 0) / 100, 0.05)
+    return score
+
+
+def best_match(title: str, year: int | None, movies: list[dict]) -> dict | None:
+    scored = [(score_match(title, year, m), m) for m in movies if m.get("id")]
+    if not scored:
+        return None
+    score, movie = max(scored, key=lambda pair: pair[0])
+    return movie if score >= MIN_SCORE else None
+
+
+def lookup(title: str, year: int | None = None) -> dict | None:
+    """Find a movie in the local index without calling TMDB."""
+    query = MovieResolution.query.filter_by(normalized_title=normalize_title(title))
+    if year:
+        query = query.filter(MovieResolution.year.between(year - 1, year + 1))
+    rows = query.order_by(MovieResolution.popularity.desc().nullslast()).limit(10).all()
+    return best_match(title, year, [r.payload for r in rows])
+
+
+def get_indexed_movie(movie_id: int) -> dict | None:
+    row = MovieResolution.query.filter_by(movie_id=movie_id).first()
+    return row.payload if row else None
+
+
+def resolve_movie(title: str, year: int | None = None) -> dict | None:
+    """Resolve a title (and optional year) to a TMDB movie payload.
+
+    The local index is tried first; on a miss TMDB is searched, every
+    result is indexed, and the best year-aware match is returned.
+    """
+    movie = lookup(title, year)
+    if movie is not None:
+        return movie
+
+    results = search_movies(title, 1).get("results") or []
+    index_movies(results)
+    return best_match(title, year, results)
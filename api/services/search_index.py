@@ -0,0 +1,211 @@
+import bisect
+import logging
+import math
+import threading
+import time
+
+from flask import current_app
+
+from app import db
+from config import Config
+from models.library_item import LibraryItem
+from models.movie_resolution import MovieResolution
+from services.resolution_index import normalize_title
+
+logger = logging.getLogger(__name__)
+
+# Fields kept per movie; enough to render a search result
+FIELDS = ("id", "title", "original_title", "overview", "poster_path", "release_date", "vote_average", "popularity")
+
+
+class MovieSearchIndex:
+    """In-process inverted index over every movie we have seen.
+
+    Built from the resolution index (search results, popular lists and
+    details) plus library items, and kept current as new payloads are
+    indexed; a full rebuild every SEARCH_INDEX_REFRESH_SECONDS, on a
+    background thread while the old index keeps serving, picks up movies
+    seen by other workers. Every query token must match a title token;
+    the last one may match as a prefix, for typeahead.
+    """
+
+    # A prefix matching more tokens than this (e.g. "t") only scans the
+    # first ones; search() then reports its results as incomplete
+    MAX_PREFIX_TOKENS = 500
+
+    def __init__(self, refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._refresh_lock = threading.Lock()
+        self._movies = {}     # TMDB id -> display fields
+        self._titles = {}     # TMDB id -> normalized title
+        self._postings = {}   # token -> set of TMDB ids
+        self._tokens = []     # sorted keys of _postings, for prefix scans
+
+    # === BUILD ===
+
+    def refresh(self) -> None:
+        """Rebuild from the database. Needs an app context."""
+        movies = {}
+        payloads = db.session.execute(
+            db.select(MovieResolution.payload).execution_options(yield_per=1000)
+        )
+        for (payload,) in payloads:
+            if payload and payload.get("id") and payload.get("title"):
+                movies[payload["id"]] = payload
+
+        library = db.session.execute(
+            db.select(
+                LibraryItem.movie_id,
+                LibraryItem.title,
+                LibraryItem.poster_path,
+                LibraryItem.release_date,
+                LibraryItem.vote_average,
+            ).execution_options(yield_per=1000)
+        )
+        for movie_id, title, poster_path, release_date, vote_average in library:
+            movies.setdefault(movie_id, {
+                "id": movie_id,
+                "title": title,
+                "poster_path": poster_path,
+                "release_date": release_date,
+                "vote_average": vote_average,
+            })
+
+        index = MovieSearchIndex(self.refresh_seconds)
+        for movie in movies.values():
+            index._add(movie)
+        index._tokens = sorted(index._postings)
+
+        with self._lock:
+            self._movies = index._movies
+            self._titles = index._titles
+            self._postings = index._postings
+            self._tokens = index._tokens
+            self._built_at = time.monotonic()
+
+    def _ensure_fresh(self) -> None:
+        if self._built_at is None:
+            # Nothing to serve yet; concurrent first searches share one build
+            with self._refresh_lock:
+                if self._built_at is None:
+                    self.refresh()
+            return
+
+        if time.monotonic() - self._built_at > self.refresh_seconds:
+            if self._refresh_lock.acquire(blocking=False):
+                threading.Thread(
+                    target=self._background_refresh,
+                    args=(current_app._get_current_object(),),
+                    name="search-index-refresh",
+                    daemon=True,
+                ).start()
+
+    def _background_refresh(self, app) -> None:
+        # Runs with _refresh_lock held; the caller acquired it
+        try:
+            with app.app_context():
+                self.refresh()
+        except Exception as e:
+            logger.warning("Search index refresh failed: %s", e)
+        finally:
+            self._refresh_lock.release()
+
+    def _add(self, movie: dict) -> list[str]:
+        # Caller holds the lock (or owns the index); returns tokens new to the index
+        movie_id = movie["id"]
+        self._remove(movie_id)
+
+        self._movies[movie_id] = {key: movie.get(key) for key in FIELDS}
+        self._titles[movie_id] = normalize_title(movie["title"])
+        words = set(self._titles[movie_id].split())
+        words.update(normalize_title(movie.get("original_title") or "").split())
+
+        new_tokens = []
+        for word in words:
+            ids = self._postings.get(word)
+            if ids is None:
+                ids = self._postings[word] = set()
+                new_tokens.append(word)
+            ids.add(movie_id)
+        return new_tokens
+
+    def _remove(self, movie_id: int) -> None:
+        # Emptied postings are left in place; the next rebuild drops them
+        for word in set(self._titles.get(movie_id, "").split()):
+            self._postings.get(word, set()).discard(movie_id)
+        original = (self._movies.get(movie_id) or {}).get("original_title")
+        for word in normalize_title(original or "").split():
+            self._postings.get(word, set()).discard(movie_id)
+
+    def add_movies(self, movies: list[dict], overwrite: bool = True) -> None:
+        """Fold newly seen payloads in without a rebuild."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            for movie in movies:
+                if not (movie.get("id") and movie.get("title")):
+                    continue
+                if not overwrite and movie["id"] in self._movies:
+                    continue
+                for token in self._add(movie):
+                    bisect.insort(self._tokens, token)
+
+    # === QUERY ===
+
+    def _prefix_ids(self, prefix: str) -> tuple[set, bool]:
+        """(ids of movies with a token starting with `prefix`, whether
+        every matching token was scanned)
+        """
+        ids = set()
+        start = bisect.bisect_left(self._tokens, prefix)
+        end = start + self.MAX_PREFIX_TOKENS
+        for token in self._tokens[start:end]:
+            if not token.startswith(prefix):
+                return ids, True
+            ids |= self._postings[token]
+        return ids, end >= len(self._tokens) or not self._tokens[end].startswith(prefix)
+
+    def search(self, query: str, limit: int = 20) -> tuple[list[dict], bool]:
+        """Movies whose title matches every query token, best first, and
+        whether that is every local match: False when more than `limit`
+        matched or the prefix scan was cut off at MAX_PREFIX_TOKENS.
+
+        Ranked by title match (exact, then leading), then popularity and
+        vote_average.
+        """
+        wanted = normalize_title(query)
+        words = wanted.split()
+        if not words:
+            return [], True
+
+        self._ensure_fresh()
+        with self._lock:
+            candidates, complete = self._prefix_ids(words[-1])
+            for word in words[:-1]:
+                if not candidates:
+                    break
+                candidates &= self._postings.get(word, set())
+
+            scored = []
+            for movie_id in candidates:
+                movie = self._movies[movie_id]
+                title = self._titles[movie_id]
+                score = math.log1p(movie.get("popularity") or 0) + (movie.get("vote_average") or 0) / 2
+                if title == wanted:
+                    score += 20
+                elif title.startswith(wanted):
+                    score += 10
+                scored.append((score, movie_id))
+
+            scored.sort(key=lambda pair: (-pair[0], pair[1]))
+            complete = complete and len(scored) <= limit
+            return [dict(self._movies[movie_id]) for _, movie_id in scored[:limit]], complete
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"movies": len(self._movies), "tokens": len(self._tokens)}
+
+
+search_index = MovieSearchIndex(refresh_seconds=Config.SEARCH_INDEX_REFRESH_SECONDS)
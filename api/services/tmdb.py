@@ -1,50 +1,150 @@
-import os 
+import math
+import threading
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlencode
+from urllib3.util.retry import Retry
 
-def search_movies(query: str, page: int = 1):
-    TMDB_BASE_URL = os.getenv("TMDB_BASE_URL")
-    TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+from config import Config
+from extensions.tracing import span
+from services.cache import make_cache
+from services.singleflight import SingleFlight
+from services.token_bucket import acquire_upstream
 
-    if not TMDB_API_KEY:
-        raise RuntimeError("TMDB API Key is not set in the environment")
-    
-    url = f"{TMDB_BASE_URL}/search/movie"
-    headers = { "Authorization": f"Bearer {TMDB_API_KEY}" }
-    params = { "query": query, "page": page }
+TIMEOUT = (Config.TMDB_CONNECT_TIMEOUT, Config.TMDB_READ_TIMEOUT)
 
-    resp = requests.get(url, headers=headers, params=params)
-    resp.raise_for_status()
-    return resp.json()
 
-def get_popular_movies(page: int = 1):
-    TMDB_BASE_URL = os.getenv("TMDB_BASE_URL")
-    TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+def _build_session() -> requests.Session:
+    """Keep-alive session with a bounded connection pool.
 
-    if not TMDB_API_KEY:
-        raise RuntimeError("TMDB API Key is not set in the environment")
-    
-    url = f"{TMDB_BASE_URL}/movie/popular"
-    headers = { "Authorization": f"Bearer {TMDB_API_KEY}" }
-    params = { "page": page }
+    429/5xx responses are retried with exponential backoff capped at
+    TMDB_BACKOFF_MAX seconds. Retry-After is not honored here, since it can
+    ask for minutes; the cache warmer's pacer reads it off the final 429.
+    Read timeouts aren't retried, so a slow TMDB costs one read timeout.
+    """
+    retry = Retry(
+        total=Config.TMDB_MAX_RETRIES,
+        read=0,
+        backoff_factor=Config.TMDB_BACKOFF_FACTOR,
+        backoff_max=Config.TMDB_BACKOFF_MAX,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    # _fetch limits concurrency to the pool size with a timeout (requests
+    # has no pool timeout), so the pool itself never needs to block
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=Config.TMDB_POOL_SIZE,
+        pool_block=False,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({ "Accept": "application/json" })
+    if Config.TMDB_API_KEY:
+        session.headers["Authorization"] = f"Bearer {Config.TMDB_API_KEY}"
+    return session
+
+
+session = _build_session()
+_pool_slots = threading.BoundedSemaphore(Config.TMDB_POOL_SIZE)
+
+# Shared response cache, keyed by endpoint + params. TTLs are per endpoint:
+# popular lists churn hourly, movie details are close to static.
+cache = make_cache(
+    Config.TMDB_CACHE_BACKEND,
+    max_entries=Config.TMDB_CACHE_MAX_ENTRIES,
+    path=Config.TMDB_CACHE_PATH,
+)
 
-    resp = requests.get(url, headers=headers, params=params)
-    resp.raise_for_status()
-    return resp.json()
+# Concurrent misses for the same key share one upstream request
+flight = SingleFlight("tmdb")
 
-def get_movie_details(movie_id: int):
-    TMDB_BASE_URL = os.getenv("TMDB_BASE_URL")
-    TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+CACHE_TTLS = {
+    "search": Config.TMDB_CACHE_TTL_SEARCH,
+    "popular": Config.TMDB_CACHE_TTL_POPULAR,
+    "details": Config.TMDB_CACHE_TTL_DETAILS,
+}
 
-    if not TMDB_API_KEY:
+
+# Optional per-thread pacing hook (see services.cache_warmer): called before
+# every upstream request made from that thread
+_local = threading.local()
+
+
+def set_pacer(pacer) -> None:
+    _local.pacer = pacer
+
+
+def _fetch(path: str, params: dict):
+    if not Config.TMDB_API_KEY:
         raise RuntimeError("TMDB API Key is not set in the environment")
 
-    url = f"{TMDB_BASE_URL}/movie/{movie_id}"
-    headers = { "Authorization": f"Bearer {TMDB_API_KEY}" }
-    params = {
-        "append_to_response": "credits,videos,images,release_dates",
-        "include_image_language": "en,null"
-    }
+    pacer = getattr(_local, "pacer", None)
+    if pacer is not None:
+        pacer()
+    # Paced background work waits its turn; requests fail fast with a 429
+    acquire_upstream("tmdb", max_wait=math.inf if pacer is not None else None)
+
+    with span("tmdb.http"):
+        if not _pool_slots.acquire(timeout=Config.TMDB_POOL_TIMEOUT):
+            raise requests.ConnectionError("Timed out waiting for a TMDB connection")
+        try:
+            resp = session.get(f"{Config.TMDB_BASE_URL}{path}", params=params, timeout=TIMEOUT)
+        finally:
+            _pool_slots.release()
+        resp.raise_for_status()
+        return resp.json()
+
+
+def _cache_key(endpoint: str, path: str, params: dict) -> str:
+    return f"tmdb:{endpoint}:{path}?{urlencode(sorted(params.items()))}"
+
+
+def _cached_get(endpoint: str, path: str, params: dict, key_params: dict | None = None, refresh: bool = False):
+    key = _cache_key(endpoint, path, key_params if key_params is not None else params)
+    with span(f"tmdb.{endpoint}"):
+        if not refresh:
+            data = cache.get(key)
+            if data is not None:
+                return data
+
+        return flight.do(key, _fetch_and_store, endpoint, key, path, params)
+
+
+def _fetch_and_store(endpoint: str, key: str, path: str, params: dict):
+    data = _fetch(path, params)
+    cache.set(key, data, CACHE_TTLS[endpoint])
+    return data
+
+
+def cache_stats() -> dict:
+    return cache.stats()
+
+
+def flight_stats() -> dict:
+    return flight.stats()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).casefold()
+
+
+def search_movies(query: str, page: int = 1, refresh: bool = False):
+    params = { "query": query, "page": page }
+    # TMDB search is case-insensitive, so normalize the key to share entries
+    key_params = { "query": normalize_query(query), "page": page }
+    return _cached_get("search", "/search/movie", params, key_params, refresh=refresh)
+
+def get_popular_movies(page: int = 1, refresh: bool = False):
+    params = { "page": page }
+    return _cached_get("popular", "/movie/popular", params, refresh=refresh)
 
-    resp = requests.get(url, headers=headers, params=params)
-    resp.raise_for_status()
-    return resp.json()
+def get_movie_details(movie_id: int, refresh: bool = False):
+    # images and release_dates were fetched here but never used
+    params = { "append_to_response": "credits,videos" }
+    return _cached_get("details", f"/movie/{movie_id}", params, refresh=refresh)
@@ -0,0 +1,185 @@
+import math
+import sqlite3
+import threading
+import time
+
+from config import Config
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class RateLimited(Exception):
+    """A bucket is empty; the caller may retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: float, scope: str = ""):
+        super().__init__(f"Rate limit exceeded{f' ({scope})' if scope else ''}")
+        self.retry_after = retry_after
+        self.scope = scope
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def parse_rate(rate: str | None) -> tuple[float, float] | None:
+    """Parse "<count>/<period>" (e.g. "120/minute") into (capacity, tokens
+    per second). Empty or "0" disables the limit (returns None).
+    """
+    rate = (rate or "").strip().lower()
+    if not rate or rate == "0":
+        return None
+    count, _, period = rate.partition("/")
+    seconds = PERIODS.get(period.strip().rstrip("s") or "second")
+    if seconds is None:
+        raise ValueError(f"Unknown rate period in {rate!r}")
+    capacity = float(count)
+    if capacity <= 0:
+        return None
+    return capacity, capacity / seconds
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, refill: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated) * refill)
+
+
+def _spend(tokens: float, cost: float, refill: float) -> tuple[bool, float, float]:
+    """(allowed, tokens left, seconds until `cost` tokens are available)"""
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / refill
+
+
+class MemoryBucketStore:
+    """Token buckets held in this process. Full buckets are dropped on a
+    periodic sweep, so idle clients don't accumulate.
+    """
+
+    def __init__(self, sweep_every: int = 1000):
+        self.sweep_every = sweep_every
+        self._buckets = {}  # key -> (tokens, updated, full_at)
+        self._lock = threading.Lock()
+        self._takes = 0
+
+    def take(self, key: str, capacity: float, refill: float, cost: float = 1) -> tuple[bool, float]:
+        now = time.time()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = _refill(tokens, updated, now, capacity, refill)
+            allowed, tokens, retry_after = _spend(tokens, cost, refill)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill)
+
+            self._takes += 1
+            if self._takes % self.sweep_every == 0:
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+        return allowed, retry_after
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "buckets": len(self._buckets)}
+
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file shared by every process that points at
+    the same path, so limits hold across workers.
+    """
+
+    def __init__(self, path: str, sweep_every: int = 1000):
+        self.path = str(path)
+        self.sweep_every = sweep_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._takes = 0
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " key TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " updated REAL NOT NULL,"
+            " full_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; take() opens its own write transaction
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: float, refill: float, cost: float = 1) -> tuple[bool, float]:
+        conn = self._conn()
+        # IMMEDIATE takes the write lock up front, so the read-modify-write
+        # can't interleave with another process
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else _refill(row[0], row[1], now, capacity, refill)
+            allowed, tokens, retry_after = _spend(tokens, cost, refill)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, now + (capacity - tokens) / refill),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._lock:
+            self._takes += 1
+            due = self._takes % self.sweep_every == 0
+        if due:
+            conn.execute("DELETE FROM buckets WHERE full_at <= ?", (now,))
+        return allowed, retry_after
+
+    def stats(self) -> dict:
+        size = self._conn().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+        return {"backend": "sqlite", "buckets": size}
+
+
+def make_bucket_store(backend: str, path: str | None = None):
+    """Build a bucket store for the configured backend name ("memory" or "sqlite")."""
+    backend = (backend or "memory").lower()
+    if backend == "memory":
+        return MemoryBucketStore()
+    if backend == "sqlite":
+        if not path:
+            raise RuntimeError("A path is required for the sqlite rate limit backend")
+        return SQLiteBucketStore(path)
+    raise RuntimeError(f"Unknown rate limit backend: {backend}")
+
+
+buckets = make_bucket_store(Config.RATE_LIMIT_BACKEND, Config.RATE_LIMIT_PATH)
+
+
+# === UPSTREAM BUDGETS ===
+# One bucket per upstream API, shared by every client (and, with the
+# sqlite backend, every worker) so bursts can't exhaust our quota
+
+UPSTREAM_RATES = {
+    "tmdb": parse_rate(Config.UPSTREAM_RATE_TMDB),
+    "openai": parse_rate(Config.UPSTREAM_RATE_OPENAI),
+}
+
+
+def acquire_upstream(name: str, cost: float = 1, max_wait: float | None = None) -> None:
+    """Take `cost` tokens from the upstream's global bucket, sleeping while
+    the wait is under `max_wait` seconds. Raises RateLimited otherwise.
+    """
+    rate = UPSTREAM_RATES.get(name)
+    if rate is None:
+        return
+    capacity, refill = rate
+    max_wait = Config.UPSTREAM_MAX_WAIT if max_wait is None else max_wait
+
+    deadline = time.monotonic() + max_wait
+    while True:
+        allowed, retry_after = buckets.take(f"upstream:{name}", capacity, refill, cost)
+        if allowed:
+            return
+        if time.monotonic() + retry_after > deadline:
+            raise RateLimited(retry_after, name)
+        time.sleep(retry_after)
@@ -0,0 +1,17 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+
+
+def insert_for(model):
+    """Dialect-specific INSERT for `model` that supports ON CONFLICT clauses.
+
+    Postgres and SQLite share the same `on_conflict_do_nothing` /
+    `on_conflict_do_update` API, so callers can chain either one.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    raise RuntimeError(f"Upserts are not supported on {dialect}")
@@ -0,0 +1,133 @@
+from sqlalchemy import event, func, inspect, or_
+
+from app import db
+from models.user import User
+from models.user_search_gram import UserSearchGram
+
+MIN_SUBSTRING_LENGTH = 3
+RAREST_GRAMS = 2
+
+
+def trigrams(text: str) -> set[str]:
+    text = (text or "").lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def user_grams(display_name: str, email: str) -> set[str]:
+    # The whole email, so domain searches match like they do on Postgres;
+    # common domain grams are never picked as the rarest for narrowing
+    return trigrams(display_name) | trigrams(email)
+
+
+# === SQLITE GRAM MAINTENANCE ===
+# Postgres searches through pg_trgm indexes on users, so these are no-ops there.
+
+def _write_grams(connection, user: User) -> None:
+    connection.execute(db.delete(UserSearchGram).where(UserSearchGram.user_id == user.id))
+    grams = user_grams(user.display_name, user.email)
+    if grams:
+        connection.execute(
+            db.insert(UserSearchGram),
+            [{"gram": gram, "user_id": user.id} for gram in grams],
+        )
+
+
+@event.listens_for(User, "after_insert")
+def _index_new_user(mapper, connection, user):
+    if connection.dialect.name != "postgresql":
+        _write_grams(connection, user)
+
+
+@event.listens_for(User, "after_update")
+def _reindex_user(mapper, connection, user):
+    if connection.dialect.name == "postgresql":
+        return
+    state = inspect(user)
+    if state.attrs.display_name.history.has_changes() or state.attrs.email.history.has_changes():
+        _write_grams(connection, user)
+
+
+@event.listens_for(User, "after_delete")
+def _unindex_user(mapper, connection, user):
+    if connection.dialect.name != "postgresql":
+        connection.execute(db.delete(UserSearchGram).where(UserSearchGram.user_id == user.id))
+
+
+# === SEARCH ===
+
+def _prefix_matches(column, q: str, exclude_id: int | None, limit: int) -> list[User]:
+    # Range scan on the (expression) index instead of LIKE 'q%', which
+    # SQLite only indexes for case-sensitive collations
+    query = User.query.filter(column >= q, column < q + "\uffff")
+    if exclude_id is not None:
+        query = query.filter(User.id != exclude_id)
+    return query.order_by(column, User.id).limit(limit).all()
+
+
+def _substring_matches(q: str, exclude_id: int | None, limit: int) -> list[User]:
+    name = func.lower(User.display_name)
+    matches = or_(name.contains(q, autoescape=True), func.lower(User.email).contains(q, autoescape=True))
+    query = User.query.filter(matches)
+    if exclude_id is not None:
+        query = query.filter(User.id != exclude_id)
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        # Served by the gin_trgm_ops indexes
+        return query.order_by(func.similarity(name, q).desc(), User.id).limit(limit).all()
+
+    # Intersect the postings of the rarest grams only; the LIKE above
+    # verifies the survivors, so the common grams add nothing but cost
+    grams = trigrams(q)
+    counts = dict(db.session.execute(
+        db.select(UserSearchGram.gram, func.count())
+        .where(UserSearchGram.gram.in_(grams))
+        .group_by(UserSearchGram.gram)
+    ).all())
+    if len(counts) < len(grams):
+        return []
+
+    rarest = sorted(counts, key=counts.get)[:RAREST_GRAMS]
+    candidates = db.intersect(*(
+        db.select(UserSearchGram.user_id).where(UserSearchGram.gram == gram) for gram in rarest
+    )) if len(rarest) > 1 else db.select(UserSearchGram.user_id).where(UserSearchGram.gram == rarest[0])
+    return query.filter(User.id.in_(candidates)).order_by(User.id).limit(limit).all()
+
+
+def _relevance(user: User, q: str) -> tuple:
+    name, email = user.display_name.lower(), user.email.lower()
+    if name == q or email == q:
+        rank = 0
+    elif name.startswith(q):
+        rank = 1
+    elif email.startswith(q):
+        return (2, email, user.id)
+    elif any(word.startswith(q) for word in name.split()):
+        rank = 3
+    else:
+        rank = 4
+    return (rank, name, user.id)
+
+
+def search_users(query: str, exclude_id: int | None = None, limit: int = 10) -> list[User]:
+    """Users whose display name or email contains `query`, best match first.
+
+    Display-name and email prefixes are found with index range scans;
+    when those don't fill the page, queries of 3+ characters fall back to
+    trigram substring matching. Order: exact, name prefix, email prefix,
+    word prefix, other substring; then name and id.
+    """
+    q = " ".join(query.split()).lower()
+    if not q:
+        return []
+
+    found = {}
+    for column in (func.lower(User.display_name), User.email):
+        for user in _prefix_matches(column, q, exclude_id, limit):
+            found[user.id] = user
+
+    if len(found) < limit and len(q) >= MIN_SUBSTRING_LENGTH:
+        # Over-fetch so word-prefix matches aren't crowded out alphabetically
+        for user in _substring_matches(q, exclude_id, limit * 3):
+            found.setdefault(user.id, user)
+
+    return sorted(found.values(), key=lambda u: _relevance(u, q))[:limit]
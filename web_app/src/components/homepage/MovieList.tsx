@@ -3,8 +3,7 @@ import { useEffect, useState } from 'react';
 import { useAuth } from '../../context/AuthContext';
 import type { Movie } from '../../types/movie';
 import MovieCard from '../MovieCard';
-
-const API_URL = import.meta.env.VITE_API_URL;
+import { libraryPages } from '../../utils/library';
 
 interface MovieListProps {
   movies: Movie[];
@@ -21,19 +20,13 @@ export default function MovieList({ movies }: MovieListProps) {
 
   const fetchSavedIds = async () => {
     try {
-      // Fetch the user's library (requires the user to be logged in)
-      const res = await fetch(`${API_URL}/api/library`, {
-        credentials: "include", // include cookies if using session auth
-      });
-
-      if (!res.ok) {
-        console.warn("Failed to fetch library:", res.status);
-        return;
+      // Fetch the user's library ids only (requires the user to be logged in)
+      const ids: number[] = [];
+      for await (const page of libraryPages<LibraryItem>({ limit: 500, fields: ["movie_id"] })) {
+        ids.push(...page.map((item) => item.movie_id));
       }
 
-      const data = await res.json();
-
-      setSavedIds(data.map((item: LibraryItem) => item.movie_id));
+      setSavedIds(ids);
     } catch (err) {
       console.error("Error fetching library:", err);
     }
@@ -73,7 +73,7 @@ export default function LibraryCarousel({ movies, onRemove }: LibraryCarouselPro
     if (detailsCache[movie.id]) return; // cached
     (async () => {
       try {
-        const res = await fetch(`${API_URL}/api/movies/${movie.id}`);
+        const res = await fetch(`${API_URL}/api/movies/${movie.id}?include=`);
         const data = await res.json();
         if (!res.ok) return;
         setDetailsCache((prev) => ({
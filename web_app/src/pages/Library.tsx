@@ -5,8 +5,7 @@ import { LayoutGrid, Film } from "lucide-react";
 import type { Movie } from "../types/movie";
 import LibraryItemCard from "../components/library/LibraryItemCard";
 import LibraryCarousel from "../components/library/LibraryCarousel";
-
-const API_URL = import.meta.env.VITE_API_URL;
+import { libraryPages } from "../utils/library";
 
 type LibraryItem = {
   id: number;
@@ -29,16 +28,26 @@ export default function Library() {
   };
 
   useEffect(() => {
+    let cancelled = false;
     (async () => {
       try {
-        const res = await fetch(`${API_URL}/api/library`, { credentials: "include" });
-        const data = await res.json();
-        if (res.ok) setItems(data);
-        else console.error(data?.error || data);
+        // Render the first page right away and append the rest as they arrive
+        const loaded: LibraryItem[] = [];
+        for await (const page of libraryPages<LibraryItem>()) {
+          if (cancelled) return;
+          loaded.push(...page);
+          setItems([...loaded]);
+          setLoading(false);
+        }
+      } catch (err) {
+        console.error(err);
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
     })();
+    return () => {
+      cancelled = true;
+    };
   }, []);
 
   if (loading) return (
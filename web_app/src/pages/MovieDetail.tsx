@@ -34,7 +34,7 @@ export default function MovieDetail() {
       setLoading(true);
       setError(null);
       try {
-        const res = await fetch(`${API_URL}/api/movies/${movieId}`);
+        const res = await fetch(`${API_URL}/api/movies/${movieId}?include=videos,cast`);
         const data = await res.json();
         if (!res.ok) throw new Error(data?.error || "Failed to load movie");
         if (!cancelled) setMovie(data);
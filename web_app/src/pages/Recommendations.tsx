@@ -67,20 +67,44 @@ export default function Recommendations() {
     setLoadingRecs(true);
     setRecs(null);
     try {
-      const res = await fetch(`${API_URL}/api/recs`, {
+      const res = await fetch(`${API_URL}/api/recs/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         credentials: "include",
         body: JSON.stringify({ user_ids: selected.map((u) => u.id) }),
       });
-      const data = await res.json().catch(() => ({ results: [] }));
-      if (!res.ok) {
+      if (!res.ok || !res.body) {
         setRecs([]);
-      } else {
-        setRecs(Array.isArray(data.results) ? data.results : []);
+        return;
       }
-    } catch (_) {
+
+      // Server-Sent Events: render each movie as soon as it resolves,
+      // slotted by the index the server assigned it.
+      const slots: (Rec | undefined)[] = [];
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
       setRecs([]);
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split("\n\n");
+        buffer = events.pop() ?? "";
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = raw.match(/^data: (.*)$/m)?.[1];
+          if (event !== "item" || !data) continue;
+
+          const { index, movie } = JSON.parse(data) as { index: number; movie: Rec };
+          slots[index] = movie;
+          setRecs(slots.filter((r): r is Rec => !!r));
+        }
+      }
+    } catch (_) {
+      setRecs((current) => current ?? []);
     } finally {
       setLoadingRecs(false);
     }
@@ -250,7 +274,7 @@ export default function Recommendations() {
               </div>
             )}
 
-            {loadingRecs && (
+            {loadingRecs && !recs?.length && (
               <div className="space-y-6">
                 <div className="text-center mb-8">
                   <div className="inline-flex items-center gap-3 px-4 py-2 rounded-full bg-gradient-to-r from-red-500/10 to-red-600/10 border border-red-500/20">
@@ -277,7 +301,7 @@ export default function Recommendations() {
               </div>
             )}
 
-            {recs && !loadingRecs && (
+            {recs && (!loadingRecs || recs.length > 0) && (
               <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
                 {recs.map((r) => (
                   <RecommendationCard key={r.id} movie={r} />
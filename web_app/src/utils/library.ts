@@ -0,0 +1,29 @@
+const API_URL = import.meta.env.VITE_API_URL;
+
+type LibraryPage<T> = {
+  items: T[];
+  next_cursor: string | null;
+};
+
+/**
+ * Walks the cursor-paginated /api/library endpoint, yielding one page of
+ * items at a time. Pass `fields` to fetch only the columns you need.
+ */
+export async function* libraryPages<T>(
+  opts: { limit?: number; fields?: string[] } = {}
+): AsyncGenerator<T[]> {
+  let cursor: string | null = null;
+  do {
+    const params = new URLSearchParams({ limit: String(opts.limit ?? 200) });
+    if (opts.fields?.length) params.set("fields", opts.fields.join(","));
+    if (cursor) params.set("cursor", cursor);
+
+    const res = await fetch(`${API_URL}/api/library?${params}`, { credentials: "include" });
+    const data = await res.json();
+    if (!res.ok) throw new Error(data?.error || `Failed to fetch library: ${res.status}`);
+
+    const page = data as LibraryPage<T>;
+    yield page.items;
+    cursor = page.next_cursor;
+  } while (cursor);
+}